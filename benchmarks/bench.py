@@ -0,0 +1,359 @@
+"""Benchmarks for parsing with Botify.
+
+Runs a workload of generated inputs through a Botify object and writes
+the latency percentiles, the throughput and the peak memory of the parses
+as JSON, so the results of two commits can be compared::
+
+    python benchmarks/bench.py --workload calc -o before.json
+    # checkout another commit
+    python benchmarks/bench.py --workload calc -o after.json
+    python benchmarks/bench.py --compare before.json after.json
+
+The `synthetic` workload generates a grammar with the given numbers of
+keywords, modifiers and priority levels. The `calc` workload uses a
+calculator grammar in the style of nlcalc. Inputs are generated from a
+seeded random generator, so every run parses the same texts.
+
+Only the standard library is used. Peak memory is measured using
+tracemalloc in a separate pass, as tracing allocations slows parsing down.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from botify import Botify, Context
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+FILLER_WORDS = ('what', 'is', 'the', 'value', 'please', 'and', 'then')
+
+WORKLOADS = ('synthetic', 'calc')
+
+
+def is_number(token):
+    try:
+        float(token)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _binary(a, b):
+    return (a + b) % 1000
+
+
+def _unary(a):
+    return (a * 7) % 1000
+
+
+def make_synthetic_bot(keywords, modifiers, priorities, rng):
+    """Return a Botify object with a generated grammar and its task list.
+
+    Every third keyword is a unary task taking the data before it, the
+    others are binary tasks taking the data on both sides. Each modifier
+    precedes one of the keywords and swaps the sides of a binary task.
+    """
+    bot = Botify(is_number, float)
+    tasks = []
+    for i in range(keywords):
+        keyword = 'kw{0}'.format(i)
+        priority = i % priorities + 1
+        if i % 3 == 2:
+            bot.add_task((keyword,), Context(_unary, priority), (-1,))
+            tasks.append((keyword, 1))
+        else:
+            bot.add_task((keyword,), Context(_binary, priority), (-1, 1))
+            tasks.append((keyword, 2))
+    modified = {}
+    for i in range(modifiers):
+        keyword, arity = rng.choice(tasks)
+        modifier = 'mod{0}'.format(i)
+        rule = (1, -1) if arity == 2 else (-1,)
+        bot.add_modifier(modifier, (keyword,), 1, Botify.ACTION_UPDATE_RULE,
+                         rule)
+        modified.setdefault(keyword, []).append(modifier)
+    return bot, tasks, modified
+
+
+def make_synthetic_input(tasks, modified, length, rng):
+    words = [str(rng.randint(1, 99))]
+    for _ in range(length):
+        keyword, arity = rng.choice(tasks)
+        if rng.random() < 0.2:
+            words.append(rng.choice(FILLER_WORDS))
+        if keyword in modified and rng.random() < 0.5:
+            words.append(rng.choice(modified[keyword]))
+        words.append(keyword)
+        if arity == 2:
+            words.append(str(rng.randint(1, 99)))
+    return ' '.join(words)
+
+
+def make_calc_bot():
+    """Return a calculator Botify object in the style of nlcalc."""
+    bot = Botify(is_number, float)
+    bot.add_task(('plus', 'add', 'added to', 'sum'),
+                 Context(lambda a, b: a + b, 1), (-1, 1))
+    bot.add_task(('minus', 'subtract', 'less'),
+                 Context(lambda a, b: a - b, 1), (-1, 1))
+    bot.add_task(('times', 'multiplied by', 'into', 'product'),
+                 Context(lambda a, b: a * b, 2), (-1, 1))
+    bot.add_task(('divided by', 'over', 'by'),
+                 Context(lambda a, b: a / b, 2), (-1, 1))
+    bot.add_task(('squared',), Context(lambda a: a * a, 3), (-1,))
+    bot.add_task(('square root', 'root'),
+                 Context(lambda a: math.sqrt(a), 3), (1,))
+    bot.add_task(('factorial',),
+                 Context(lambda a: float(math.factorial(int(a))), 3), (-1,))
+    bot.add_modifier('of', ('factorial',), -1, Botify.ACTION_UPDATE_RULE,
+                     (1,))
+    return bot
+
+
+_CALC_BINARY = ('plus', 'add', 'added to', 'minus', 'subtract', 'times',
+                'multiplied by', 'into', 'divided by', 'over')
+
+
+def _make_calc_operand(rng):
+    number = str(rng.randint(1, 20))
+    choice = rng.random()
+    if choice < 0.1:
+        return 'square root of ' + number
+    if choice < 0.15:
+        return str(rng.randint(1, 10)) + ' factorial'
+    if choice < 0.2:
+        return 'factorial of ' + str(rng.randint(1, 10))
+    if choice < 0.3:
+        return number + ' squared'
+    return number
+
+
+def make_calc_input(length, rng):
+    words = ['what is', _make_calc_operand(rng)]
+    for _ in range(length):
+        words.append(rng.choice(_CALC_BINARY))
+        words.append(_make_calc_operand(rng))
+    return ' '.join(words)
+
+
+def make_workload(args):
+    """Return the bot and the list of texts for the chosen workload."""
+    rng = random.Random(args.seed)
+    if args.workload == 'calc':
+        bot = make_calc_bot()
+        texts = [make_calc_input(args.length, rng)
+                 for _ in range(args.inputs)]
+    else:
+        bot, tasks, modified = make_synthetic_bot(
+            args.keywords, args.modifiers, args.priorities, rng)
+        texts = [make_synthetic_input(tasks, modified, args.length, rng)
+                 for _ in range(args.inputs)]
+    bot.strict_mode_enabled = not args.non_strict
+    if args.plan_cache:
+        bot.enable_plan_cache(args.plan_cache)
+    if args.token_cache:
+        bot.enable_token_cache(args.token_cache)
+    return bot, texts
+
+
+def parse_all(bot, texts):
+    """Parse every text once, returning the latencies and error count."""
+    latencies = []
+    errors = 0
+    for text in texts:
+        start = _timer()
+        try:
+            bot.parse(text)
+        except (ValueError, ArithmeticError):
+            errors += 1
+        latencies.append(_timer() - start)
+    return latencies, errors
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of a sorted list."""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank - 1, 0)]
+
+
+def measure_peak_memory(bot, texts):
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        parse_all(bot, texts)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure_phases(bot, texts):
+    bot.enable_metrics()
+    try:
+        parse_all(bot, texts)
+        return bot.get_metrics()
+    finally:
+        bot.disable_metrics()
+
+
+def get_commit():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('ascii').strip()
+
+
+def run(args):
+    bot, texts = make_workload(args)
+    parse_all(bot, texts[:args.warmup])
+
+    latencies = []
+    errors = 0
+    gc_was_enabled = gc.isenabled()
+    if args.disable_gc:
+        gc.disable()
+    try:
+        start = _timer()
+        for _ in range(args.repeat):
+            run_latencies, run_errors = parse_all(bot, texts)
+            latencies.extend(run_latencies)
+            errors += run_errors
+        total = _timer() - start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    latencies.sort()
+    results = {
+        'parses': len(latencies),
+        'errors': errors,
+        'total_seconds': total,
+        'throughput': len(latencies) / total if total else None,
+        'latency_us': {
+            'mean': sum(latencies) / len(latencies) * 1e6,
+            'p50': percentile(latencies, 50) * 1e6,
+            'p90': percentile(latencies, 90) * 1e6,
+            'p99': percentile(latencies, 99) * 1e6,
+            'max': latencies[-1] * 1e6,
+        },
+        'peak_memory_bytes': measure_peak_memory(bot, texts),
+    }
+    if args.phases:
+        results['metrics'] = measure_phases(bot, texts)
+
+    config = dict(vars(args))
+    for key in ('output', 'compare'):
+        config.pop(key, None)
+    return {
+        'benchmark': config,
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'commit': get_commit(),
+        },
+        'results': results,
+    }
+
+
+_COMPARED = (('throughput', ('throughput',)),
+             ('latency mean', ('latency_us', 'mean')),
+             ('latency p50', ('latency_us', 'p50')),
+             ('latency p90', ('latency_us', 'p90')),
+             ('latency p99', ('latency_us', 'p99')),
+             ('peak memory', ('peak_memory_bytes',)))
+
+
+def compare(old_path, new_path, out=sys.stdout):
+    """Print the relative change of the results of two benchmark runs."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    if old['benchmark'] != new['benchmark']:
+        out.write('warning: the runs used different settings\n')
+    out.write('{0:<14}{1:>16}{2:>16}{3:>10}\n'.format('', old_path, new_path,
+                                                     'change'))
+    for name, path in _COMPARED:
+        old_value, new_value = old['results'], new['results']
+        for key in path:
+            old_value, new_value = old_value[key], new_value[key]
+        if old_value is None or new_value is None:
+            continue
+        change = ((new_value - old_value) / old_value * 100
+                  if old_value else float('nan'))
+        out.write('{0:<14}{1:>16.2f}{2:>16.2f}{3:>9.1f}%\n'.format(
+            name, old_value, new_value, change))
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workload', choices=WORKLOADS, default='synthetic')
+    parser.add_argument('--keywords', type=int, default=50,
+                        help='number of task keywords (synthetic)')
+    parser.add_argument('--modifiers', type=int, default=10,
+                        help='number of modifiers (synthetic)')
+    parser.add_argument('--priorities', type=int, default=3,
+                        help='number of priority levels (synthetic)')
+    parser.add_argument('--length', type=int, default=10,
+                        help='number of tasks in every input')
+    parser.add_argument('--inputs', type=int, default=500,
+                        help='number of distinct inputs')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of times every input is parsed')
+    parser.add_argument('--warmup', type=int, default=50,
+                        help='number of inputs parsed before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--non-strict', action='store_true',
+                        help='disable strict mode')
+    parser.add_argument('--plan-cache', type=int, default=0, metavar='SIZE',
+                        help='enable the plan cache with SIZE entries')
+    parser.add_argument('--token-cache', type=int, default=0, metavar='SIZE',
+                        help='enable the token cache with SIZE entries')
+    parser.add_argument('--disable-gc', action='store_true',
+                        help='disable the garbage collector while timing')
+    parser.add_argument('--phases', action='store_true',
+                        help='add the per-phase metrics of one more pass')
+    parser.add_argument('-o', '--output',
+                        help='write the JSON results to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return
+    data = json.dumps(run(args), indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,19 @@
+from .batch import ParseOutcome
 from .botify import Botify, Context
+from .budget import BudgetExceededError, ParseBudget
+from .columnar import ColumnPlan, vectorized
+from .compiled import CompiledBot, ModifierIssue
+from .deferred import Expression, ExpressionGraph
+from .metrics import MetricsHook, ParseMetrics, ParseSample
+from .session import ParseSession
+from .snapshot import load_snapshot, save_snapshot
+from .stream import StreamWindowError
+from .tokenizer import RegexTokenizer
+from .trace import TraceRecord
 
-__all__ = ['Botify', 'Context']
+__all__ = ['Botify', 'BudgetExceededError', 'ColumnPlan', 'Context',
+           'CompiledBot', 'Expression', 'ExpressionGraph', 'MetricsHook',
+           'ModifierIssue', 'ParseBudget', 'ParseMetrics', 'ParseOutcome',
+           'ParseSample', 'ParseSession', 'RegexTokenizer',
+           'StreamWindowError', 'TraceRecord', 'load_snapshot',
+           'save_snapshot', 'vectorized']
@@ -0,0 +1,147 @@
+"""asyncio support for parsing with task functions which are coroutines."""
+import asyncio
+import inspect
+
+from .engine import KIND_DATA, is_linked
+from .metrics import PHASE_EVALUATE, PHASE_MODIFIERS, PHASE_TOKENIZE
+
+
+def _bind_directly(bot, session, node, pending):
+    # Return the data nodes for the task at `node` if they can all be found
+    # through its rule without resolving another task and without walking
+    # over a task whose result is still awaited, else None. The offsets
+    # walked are counted as resolver steps, like the resolver does, but only
+    # if the data is found, since the resolver walks them again otherwise.
+    nodes = session.nodes
+    args_count = bot._arity[node.context.function]
+    data_nodes = []
+    steps = 0
+    for i in node.rule:
+        steps += 1
+        step = 1 if i > 0 else -1
+        k = node
+        for _ in range(abs(i)):
+            k = nodes.walk(k, step)
+            if k is None:
+                break
+            if k in pending:
+                return None
+        if k is not None:
+            if k.kind is not KIND_DATA:
+                return None
+            data_nodes.append(k)
+        if len(data_nodes) == args_count:
+            break
+    if len(data_nodes) != args_count:
+        return None
+    if session.metrics is not None:
+        session.metrics.resolver_steps += steps
+    if session.budget is not None:
+        for _ in range(steps):
+            session.budget.step()
+    return data_nodes
+
+
+def _run_until_complete(coroutine):
+    # asyncio.run only exists since Python 3.7
+    run = getattr(asyncio, 'run', None)
+    if run is not None:
+        return run(coroutine)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+async def _await_result(res):
+    if inspect.isawaitable(res):
+        return await res
+    return res
+
+
+async def _flush(bot, session, pending):
+    # Await the tasks started since the last flush concurrently, then
+    # apply their results in the order they were started.
+    if not pending:
+        return
+    started = list(pending.values())
+    results = await asyncio.gather(*[_await_result(res)
+                                     for _, _, _, _, res in started])
+    for (node, data_nodes, task_context, data_list, _), res in zip(started,
+                                                                   results):
+        bot._finish_task(session, node, data_nodes, task_context, data_list,
+                         res)
+    pending.clear()
+
+
+async def _find_data(bot, session, root):
+    for node, data_nodes in bot._resolve(session, root):
+        task_context, data_list = bot._take_task(session, node, data_nodes)
+        res = await _await_result(task_context.function(*data_list))
+        bot._finish_task(session, node, data_nodes, task_context, data_list,
+                         res)
+
+
+async def parse_session_async(bot, text, trace=False):
+    """Parse the string `text` using `bot` and return the ParseSession used.
+
+    Task functions may be coroutine functions or return awaitables. Within
+    a priority level, consecutive tasks whose data can be found without
+    looking past another pending task are started one after the other and
+    awaited together with asyncio.gather. Their results are applied in the
+    order the tasks were started, so the report is the same as the one of
+    a synchronous parse. Any other task is awaited on its own, after the
+    pending tasks have been applied.
+
+    The plan cache of `bot` is not used. With metrics enabled, the time
+    spent awaiting the tasks is only counted in the `evaluate` phase.
+    """
+    session = bot._new_session(text, trace)
+    try:
+        await _run(bot, session)
+    finally:
+        bot._end_session(session)
+    return session
+
+
+async def _run(bot, session):
+    metrics = session.metrics
+    modifier_index_list = bot._tokenize(session)[0]
+    if metrics is not None:
+        metrics.lap(PHASE_TOKENIZE)
+    bot._apply_modifiers(session, modifier_index_list)
+    if metrics is not None:
+        metrics.lap(PHASE_MODIFIERS)
+    try:
+        await _evaluate(bot, session)
+    finally:
+        if metrics is not None:
+            metrics.lap(PHASE_EVALUATE)
+
+
+async def _evaluate(bot, session):
+    buckets = bot._get_buckets(session)
+    pending = {}
+    for priority in bot._priorities:
+        for node in buckets.get(priority, ()):
+            if not is_linked(node) or node.kind is KIND_DATA:
+                # already evaluated as a neighbour of another task
+                continue
+            data_nodes = _bind_directly(bot, session, node, pending)
+            if data_nodes is None:
+                await _flush(bot, session, pending)
+                await _find_data(bot, session, node)
+            else:
+                task_context, data_list = bot._take_task(session, node,
+                                                         data_nodes)
+                res = task_context.function(*data_list)
+                pending[node] = (node, data_nodes, task_context, data_list,
+                                 res)
+        await _flush(bot, session, pending)
+    session.result = bot._get_result(session)
+
+
+async def parse_async(bot, text):
+    """Parse the string `text` using `bot` and return the left over Data."""
+    return (await parse_session_async(bot, text)).result
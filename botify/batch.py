@@ -0,0 +1,169 @@
+from collections import namedtuple
+import functools
+import multiprocessing
+
+from .metrics import MetricsHook
+
+
+class ParseOutcome(namedtuple('ParseOutcome', ('result', 'error'))):
+    """Outcome of parsing one of the texts given to parse_many.
+
+    `result` is the tuple returned by parse, or None if parsing raised an
+    exception, which is then stored in `error`.
+    """
+    __slots__ = ()
+
+
+EXECUTOR_SERIAL = 'serial'
+EXECUTOR_THREAD = 'thread'
+EXECUTOR_PROCESS = 'process'
+
+# grammar used by the worker processes, set once per worker
+_worker_bot = None
+
+
+def _parse_chunk(bot, texts):
+    outcomes = []
+    for text in texts:
+        try:
+            outcomes.append(ParseOutcome(bot.parse(text), None))
+        except Exception as e:
+            outcomes.append(ParseOutcome(None, e))
+    return outcomes
+
+
+class _SampleCollector(MetricsHook):
+    # keeps the samples of the parses made in a worker process
+    def __init__(self):
+        self.samples = []
+
+    def on_parse(self, sample):
+        self.samples.append(sample)
+
+
+def _parse_chunk_remotely(bot, texts):
+    # Parse `texts` in a worker process. The copy of the grammar held by
+    # the worker has metrics and a trace buffer of its own, so the samples
+    # and the trace records of the parses are sent back with the outcomes,
+    # to be merged by _merge_chunk.
+    collector = _SampleCollector()
+    if bot._metrics is not None:
+        bot._metrics.hooks = [collector]
+    if bot._trace_buffer is not None:
+        bot._trace_buffer.clear()
+    outcomes = _parse_chunk(bot, texts)
+    records = []
+    if bot._trace_buffer is not None:
+        records = bot._trace_buffer.records()
+    return outcomes, collector.samples, records
+
+
+def _merge_chunk(bot, chunk):
+    # Add the samples and the trace records of a chunk parsed in a worker
+    # process to the metrics and the trace buffer of `bot`, and return the
+    # outcomes. The parses are numbered again, since the ids given by the
+    # workers overlap.
+    outcomes, samples, records = chunk
+    parse_ids = {}
+
+    def get_parse_id(worker_id):
+        if worker_id not in parse_ids:
+            parse_ids[worker_id] = next(bot._parse_ids)
+        return parse_ids[worker_id]
+
+    if bot._metrics is not None:
+        for sample in samples:
+            sample.parse_id = get_parse_id(sample.parse_id)
+            bot._metrics.add_sample(sample)
+    if bot._trace_buffer is not None:
+        bot._trace_buffer.extend(
+            record._replace(parse_id=get_parse_id(record.parse_id))
+            for record in records)
+    return outcomes
+
+
+def _init_worker(bot):
+    global _worker_bot
+    _worker_bot = bot
+
+
+def _parse_chunk_in_worker(texts):
+    return _parse_chunk_remotely(_worker_bot, texts)
+
+
+def _get_cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def _new_process_pool(futures, max_workers, bot):
+    # Return a pool of worker processes holding `bot`, along with the
+    # function parsing a chunk of texts in them, whose results are passed
+    # to _merge_chunk. The grammar is handed to every worker once through
+    # the initializer, so the chunks only carry the texts. Before Python
+    # 3.7, ProcessPoolExecutor takes no initializer and the grammar is sent
+    # along with every chunk instead.
+    try:
+        pool = futures.ProcessPoolExecutor(max_workers,
+                                           initializer=_init_worker,
+                                           initargs=(bot,))
+    except TypeError:
+        return (futures.ProcessPoolExecutor(max_workers),
+                functools.partial(_parse_chunk_remotely, bot))
+    return pool, _parse_chunk_in_worker
+
+
+def _get_chunks(texts, chunksize):
+    return [texts[i:i+chunksize] for i in range(0, len(texts), chunksize)]
+
+
+def parse_many(bot, texts, executor=EXECUTOR_SERIAL, max_workers=None,
+               chunksize=None):
+    """Parse every string of `texts` using `bot`.
+
+    Parameters
+    ----------
+    bot : CompiledBot
+        the grammar used to parse the texts.
+    texts : iterable of str
+        strings to be parsed.
+    executor : str
+        one of 'serial', 'thread' or 'process'.(Default 'serial')
+    max_workers : int
+        number of threads or processes to use. Defaults to the number of
+        CPUs.
+    chunksize : int
+        number of texts sent to a worker at once. By default the texts are
+        split into about four chunks per worker.
+
+    Returns
+    -------
+    outcomes : list of ParseOutcome
+        the outcome of parsing each text, in the order of `texts`.
+    """
+    texts = list(texts)
+    if executor == EXECUTOR_SERIAL:
+        return _parse_chunk(bot, texts)
+    if executor not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+        raise ValueError("Unknown executor {0!r}".format(executor))
+    if max_workers is None:
+        max_workers = _get_cpu_count()
+    if chunksize is None:
+        chunksize = max(1, -(-len(texts) // (max_workers * 4)))
+    elif chunksize <= 0:
+        raise ValueError("chunksize must be a positive integer")
+    chunks = _get_chunks(texts, chunksize)
+
+    # concurrent.futures is not available on every supported version
+    from concurrent import futures
+    if executor == EXECUTOR_THREAD:
+        with futures.ThreadPoolExecutor(max_workers) as pool:
+            results = pool.map(_parse_chunk, [bot] * len(chunks), chunks)
+            return [outcome for chunk in results for outcome in chunk]
+    pool, parse_chunk = _new_process_pool(futures, max_workers, bot)
+    with pool:
+        results = pool.map(parse_chunk, chunks)
+        return [outcome for chunk in results
+                for outcome in _merge_chunk(bot, chunk)]
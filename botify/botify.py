@@ -1,7 +1,51 @@
-from .utils import get_args_count
+from .batch import (EXECUTOR_PROCESS, EXECUTOR_SERIAL, EXECUTOR_THREAD,
+                    parse_many)
+from .budget import ParseBudget
+from .compiled import CompiledBot
+from .metrics import ParseMetrics
+from .session import ParseSession
+from .tokenizer import RegexTokenizer, normalize_keyword
+from .trace import TRACE_FULL, TRACE_OFF, TRACE_SAMPLED, TraceBuffer
 from collections import namedtuple
+from contextlib import contextmanager
+import threading
+
+
+class Context(namedtuple('Context', ('function', 'priority'))):
+    """The function run for a task and its priority.
+
+    Tasks with a higher `priority` are run first. A task is `pure` if its
+    result only depends on its arguments, in which case its results may be
+    cached, see :meth:`Botify.enable_result_cache`. (Default False)
+
+    `pure` is not one of the fields of the tuple, so a Context unpacks and
+    compares as ``(function, priority)``.
+    """
+    pure = False
+
+    def __new__(cls, function, priority, pure=False):
+        self = super(Context, cls).__new__(cls, function, priority)
+        if pure:
+            self.pure = True
+        return self
+
+    def __reduce__(self):
+        return type(self), (self.function, self.priority, self.pure)
+
+    def __repr__(self):
+        if not self.pure:
+            return super(Context, self).__repr__()
+        return 'Context(function={0!r}, priority={1!r}, pure=True)'.format(
+            self.function, self.priority)
+
+
+def _is_token_data_default(token):
+    return False
+
+
+def _clean_data_default(token):
+    return token
 
-Context = namedtuple('Context', ('function', 'priority'))
 
 class Botify(object):
     """Framework for creating tools which perform various tasks
@@ -15,6 +59,9 @@ class Botify(object):
     ----------
     StrictModeEnabled : bool
         whether strict mode is enabled(Default True).
+    version : int
+        version of the grammar, increased every time tasks or modifiers
+        are added, see :meth:`bulk_update`.
 
     Parameters
     ----------
@@ -30,45 +77,77 @@ class Botify(object):
         A function to perform any modification prior to passing the string
         token to the appropriate task. This callback if specified, will be used
         to generate the parameters which are to be passed to the tasks.
+
+    tokenizer : function
+        A function splitting a text into tokens. It should take the text
+        and return a list of ``(start, end, kind)`` tuples, one for every
+        token, `kind` being ``'data'`` for tokens which are known to be
+        data, in which case `is_token_data_callback` is not run for them.
+        Keywords are split into tokens using the same function. Defaults to
+        a RegexTokenizer, which separates numbers, words and punctuation.
     """
     ACTION_DELETE = 'delete'
     ACTION_UPDATE_RULE = 'update_rule'
     ACTION_UPDATE_CONTEXT = 'update_context'
+
+    TRACE_OFF = TRACE_OFF
+    TRACE_SAMPLED = TRACE_SAMPLED
+    TRACE_FULL = TRACE_FULL
+
+    EXECUTOR_SERIAL = EXECUTOR_SERIAL
+    EXECUTOR_THREAD = EXECUTOR_THREAD
+    EXECUTOR_PROCESS = EXECUTOR_PROCESS
     
     def __init__(self, is_token_data_callback=None,
-                 clean_data_callback=None):
-        self._parsed_list = []
-        self._most_recent_report = []
+                 clean_data_callback=None, tokenizer=None):
+        self._most_recent_session = ParseSession('')
+        self._compiled = None
+        # The last compiled grammar once tasks or modifiers were added
+        # after it, and the keywords which changed since. They are
+        # compiled into it again on the next parse.
+        self._outdated = None
+        self._changed_tasks = set()
+        self._changed_modifiers = set()
         
         if is_token_data_callback is None:
-            self._is_token_data_callback = lambda x: False
+            self._is_token_data_callback = _is_token_data_default
         else:
             self._is_token_data_callback = is_token_data_callback
         
         if clean_data_callback is None:
-            self._clean_data_callback = lambda x: x
+            self._clean_data_callback = _clean_data_default
         else:
             self._clean_data_callback = clean_data_callback
-        
-        self._clean_data_callback = clean_data_callback
+
+        if tokenizer is None:
+            self._tokenizer = RegexTokenizer()
+        else:
+            self._tokenizer = tokenizer
+
         self.strict_mode_enabled = True
+        self._plan_cache_size = 0
+        self._token_cache_size = 0
+        self._result_cache_size = 0
+        self._result_cache_ttl = None
+        self._trace_level = TRACE_OFF
+        self._trace_sample_rate = 100
+        self._trace_buffer = None
+        self._metrics = None
+        self._budget = None
+        self._typo_max_distance = 0
+        self._typo_min_length = 4
+        # The dicts below are only read and changed while holding the lock.
+        # The dicts they hold are never changed in place, so a copy of the
+        # grammar is as cheap as copying them.
         self._tasks = {}
         #self._rule_modifiers = {}
         #self._context_modifiers = {}
         self._modifiers = {}
-
-    def _get_priority_set(self):
-        s = set()
-        for item in self._parsed_list:
-            if self._is_token_data_callback(item) is False:
-                s.add(item['context'][1])
-        return s
-
-    def _get_action_mapping(self):
-        return {self.ACTION_DELETE : self._action_delete,
-                self.ACTION_UPDATE_RULE : self._action_update_rule,
-                self.ACTION_UPDATE_CONTEXT : self._action_update_context,
-        }
+        self.version = 0
+        # Held only while an update is published or the grammar compiled,
+        # never while the changes of a bulk_update block are gathered.
+        self._update_lock = threading.RLock()
+        self._local = threading.local()
 
     def add_task(self, keywords, context, rule):
         """Map a function to a list of keywords
@@ -76,15 +155,19 @@ class Botify(object):
         Parameters
         ----------
         keywords : iterable of str
-            sequence of strings which should trigger the given function
+            sequence of strings which should trigger the given function.
+            A keyword may be a phrase of several words like `square root`.
+            When phrases overlap, the longest one found in the text wins.
         context : Context
             A Context object created using desired function
         rule : tuple
             A tuple of integers, which act as relative indices using which data
             is extracted to be passed to the function passed via context.
         """
-        for keyword in keywords:
-            self._tasks[keyword] = {'context': context, 'rule': rule}
+        with self._update() as update:
+            for keyword in keywords:
+                keyword = normalize_keyword(keyword, self._tokenizer)
+                update.tasks[keyword] = {'context': context, 'rule': rule}
 
     def add_modifier(self, modifier, keywords, relative_pos,
                      action, parameter=None):
@@ -93,7 +176,8 @@ class Botify(object):
         Parameters
         ----------
         modifier : str
-            A string value which would trigger the given Modifier.
+            A string value which would trigger the given Modifier. It may
+            be a phrase of several words.
         keywords : iterable of str
             sequence of strings which are keywords for some task,
             which has to be modified.
@@ -111,14 +195,478 @@ class Botify(object):
         """
         if relative_pos == 0:
             raise ValueError("relative_pos cannot be 0")
-        modifier_dict = self._modifiers.get(modifier, {})
+        if action not in (self.ACTION_DELETE, self.ACTION_UPDATE_RULE,
+                          self.ACTION_UPDATE_CONTEXT):
+            raise ValueError("Unknown action {0!r}".format(action))
         value = (action, parameter, relative_pos)
-        for keyword in keywords:
-            action_list = list(modifier_dict.get(keyword, []))
-            action_list.append(value)
-            modifier_dict[keyword] = tuple(action_list)
-        self._modifiers[modifier] = modifier_dict
+        with self._update() as update:
+            modifier = normalize_keyword(modifier, self._tokenizer)
+            added = update.modifiers.setdefault(modifier, {})
+            for keyword in keywords:
+                keyword = normalize_keyword(keyword, self._tokenizer)
+                added[keyword] = added.get(keyword, ()) + (value,)
+
+    @contextmanager
+    def bulk_update(self):
+        """Apply the tasks and modifiers added in a with block at once.
+
+        Every call to :meth:`add_task` or :meth:`add_modifier` creates a
+        new version of the grammar. Within a `bulk_update` block, they are
+        gathered into a single version, published when the block ends::
+
+            with bot.bulk_update():
+                bot.add_task(('plus',), Context(add, 1), (-1, 1))
+                bot.add_modifier('twice', ('plus',), 1, ...)
+
+        Parses running meanwhile, in this thread or in others, keep using
+        the previous version, so none of them sees a part of the changes,
+        and none of them waits for the block to end. If the block raises,
+        none of its changes are applied. Updates made by other threads
+        meanwhile are published on their own.
+
+        Yields
+        ------
+        bot : Botify
+            this object.
+        """
+        with self._update():
+            yield self
+
+    @contextmanager
+    def _update(self):
+        # Gather changes to the grammar, and publish them as a new version
+        # when the outermost block of the thread ends. The lock is only
+        # taken then, so parses never wait for a block to end.
+        update = getattr(self._local, 'pending', None)
+        if update is not None:
+            yield update
+            return
+        update = self._local.pending = _GrammarUpdate()
+        try:
+            yield update
+        finally:
+            self._local.pending = None
+        if update.tasks or update.modifiers:
+            with self._update_lock:
+                self._publish(update)
+
+    def _publish(self, update):
+        # The cost only depends on the size of the update. The compiled
+        # grammar is brought up to date on the next parse, at once for all
+        # the updates made meanwhile.
+        self._tasks.update(update.tasks)
+        for modifier, added in update.modifiers.items():
+            # the published dict may be shared with a copy, and changed by
+            # another thread since the update started
+            modifier_dict = dict(self._modifiers.get(modifier, {}))
+            for keyword, values in added.items():
+                modifier_dict[keyword] = modifier_dict.get(keyword,
+                                                           ()) + values
+            self._modifiers[modifier] = modifier_dict
+        self.version += 1
+        if self._compiled is not None:
+            self._outdated = self._compiled
+            self._compiled = None
+        if self._outdated is not None:
+            self._changed_tasks.update(update.tasks)
+            self._changed_modifiers.update(update.modifiers)
     
+    def check_modifiers(self):
+        """Return the problems found with the registered modifiers.
+
+        A modifier targeting a keyword which is not registered as a task
+        is never applied, and of several actions updating the rule or the
+        context of the same target, only the last one has an effect. The
+        positions targeted in the text are checked while parsing, a
+        modifier pointing outside of the parsed list is not applied.
+
+        Returns
+        -------
+        issues : tuple of ModifierIssue
+            `modifier`, `keyword`, `relative_pos` and a `message`
+            describing each problem.
+        """
+        return self._get_compiled().modifier_issues
+
+    def compile(self):
+        """Freeze the registered tasks and modifiers into a CompiledBot.
+
+        The returned object is independent of this bot, i.e. tasks and
+        modifiers added afterwards are not reflected in it.
+
+        Returns
+        -------
+        compiled : CompiledBot
+            An immutable object which can be used to parse text.
+        """
+        with self._update_lock:
+            tasks, modifiers = dict(self._tasks), dict(self._modifiers)
+            version = self.version
+        return CompiledBot(tasks, modifiers,
+                           self._is_token_data_callback,
+                           self._clean_data_callback,
+                           self.strict_mode_enabled,
+                           self._plan_cache_size,
+                           self._token_cache_size,
+                           self._tokenizer,
+                           self._trace_level,
+                           self._trace_sample_rate,
+                           self._trace_buffer,
+                           self._metrics,
+                           self._result_cache_size,
+                           self._result_cache_ttl,
+                           self._budget,
+                           self._typo_max_distance,
+                           self._typo_min_length,
+                           version)
+
+    def enable_plan_cache(self, maxsize=128):
+        """Cache the resolved order of task calls for each shape of input.
+
+        The shape of an input is the sequence of keywords, modifiers and
+        data fields found in it. Inputs with the same shape, like
+        `add 2 and 3` and `add 5 and 7`, are resolved the same way, so the
+        cached plan is just run with the new data. Tasks are assumed to
+        return valid data for the same shapes of input. When a result does
+        not fit the plan, the input is parsed from scratch, which runs the
+        tasks already called once more.
+
+        When a task or a modifier is added, the plans of the inputs
+        containing its keyword are discarded.
+
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of plans to cache.(Default 128)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self._plan_cache_size = maxsize
+        self._invalidate()
+
+    def disable_plan_cache(self):
+        """Stop caching plans and discard the cached ones."""
+        self._plan_cache_size = 0
+        self._invalidate()
+
+    def plan_cache_info(self):
+        """Return the statistics of the plan cache.
+
+        Returns
+        -------
+        info : CacheInfo
+            hits, misses, maxsize and currsize of the cache, or None if
+            the plan cache is disabled.
+        """
+        return self._get_compiled().plan_cache_info()
+
+    def _get_compiled(self):
+        compiled = self._compiled
+        if (compiled is None
+                or compiled.strict_mode_enabled != self.strict_mode_enabled):
+            with self._update_lock:
+                compiled = self._compiled
+                if (compiled is None or compiled.strict_mode_enabled
+                        != self.strict_mode_enabled):
+                    compiled = self._compiled = self._recompile()
+        return compiled
+
+    def _recompile(self):
+        # Only the keywords which changed since the outdated grammar are
+        # compiled again, unless a setting changed meanwhile.
+        outdated = self._outdated
+        if (outdated is not None and outdated.strict_mode_enabled
+                == self.strict_mode_enabled):
+            compiled = outdated.updated(self._tasks, self._modifiers,
+                                        self._changed_tasks,
+                                        self._changed_modifiers,
+                                        self.version)
+        else:
+            compiled = self.compile()
+        self._outdated = None
+        self._changed_tasks = set()
+        self._changed_modifiers = set()
+        return compiled
+
+    def _invalidate(self):
+        # Settings are compiled into the grammar, so it is compiled from
+        # scratch on the next parse.
+        with self._update_lock:
+            self._compiled = None
+            self._outdated = None
+            self._changed_tasks = set()
+            self._changed_modifiers = set()
+
+    def enable_token_cache(self, maxsize=1024):
+        """Cache the results of the callbacks for the tokens seen.
+
+        `is_token_data_callback` and `clean_data_callback` are then called
+        at most once for every distinct token string held by the cache, so
+        they should not depend on anything but the token. Cleaned values
+        are shared between parses and should not be modified by tasks.
+
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of tokens to cache.(Default 1024)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self._token_cache_size = maxsize
+        self._invalidate()
+
+    def disable_token_cache(self):
+        """Stop caching the results of the callbacks."""
+        self._token_cache_size = 0
+        self._invalidate()
+
+    def token_cache_info(self):
+        """Return the statistics of the token cache.
+
+        Returns
+        -------
+        info : CacheInfo
+            hits, misses, maxsize and currsize of the cache, or None if
+            the token cache is disabled.
+        """
+        return self._get_compiled().token_cache_info()
+
+    def enable_result_cache(self, maxsize=1024, ttl=None):
+        """Cache the results of the tasks whose Context is `pure`.
+
+        Results are keyed on the task function and the arguments passed to
+        it, and shared by all the parses. A pure task called again with
+        equal arguments returns the cached result without being run. Tasks
+        called with unhashable arguments are always run, and so are the
+        tasks of asynchronous and deferred parses.
+
+        The cache is kept when tasks or modifiers are added, since the
+        results do not depend on the grammar.
+
+        Parameters
+        ----------
+        maxsize : int
+            maximum number of results to cache, the least recently used
+            one being evicted first.(Default 1024)
+        ttl : float
+            number of seconds a result is kept for, None to keep results
+            until they are evicted.(Default None)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be a positive number")
+        self._result_cache_size = maxsize
+        self._result_cache_ttl = ttl
+        self._invalidate()
+
+    def disable_result_cache(self):
+        """Stop caching the results of pure tasks."""
+        self._result_cache_size = 0
+        self._result_cache_ttl = None
+        self._invalidate()
+
+    def result_cache_info(self):
+        """Return the statistics of the result cache.
+
+        Returns
+        -------
+        info : CacheInfo
+            hits, misses, maxsize and currsize of the cache, or None if
+            the result cache is disabled.
+        """
+        return self._get_compiled().result_cache_info()
+
+    def set_trace_level(self, level, sample_rate=100, buffer_size=1024):
+        """Choose which parses record a report of the tasks they run.
+
+        Reporting is off by default, so parsing does not allocate anything
+        for it. With TRACE_SAMPLED one parse in `sample_rate` is traced and
+        with TRACE_FULL every parse is. The records of the traced parses
+        are written to a ring buffer of `buffer_size` records shared by all
+        the parses, which can be read using :meth:`get_trace`.
+
+        A single parse can also be traced by passing ``trace=True`` to
+        :meth:`parse_session`.
+
+        Parameters
+        ----------
+        level : str
+            one of Botify.TRACE_OFF, Botify.TRACE_SAMPLED or
+            Botify.TRACE_FULL.
+        sample_rate : int
+            one parse in `sample_rate` is traced with TRACE_SAMPLED.
+            (Default 100)
+        buffer_size : int
+            maximum number of records held by the ring buffer.
+            (Default 1024)
+        """
+        if level not in (TRACE_OFF, TRACE_SAMPLED, TRACE_FULL):
+            raise ValueError("Unknown trace level {0!r}".format(level))
+        if sample_rate <= 0:
+            raise ValueError("sample_rate must be a positive integer")
+        if level == TRACE_OFF:
+            self._trace_buffer = None
+        elif (self._trace_buffer is None
+              or self._trace_buffer.capacity != buffer_size):
+            self._trace_buffer = TraceBuffer(buffer_size)
+        self._trace_level = level
+        self._trace_sample_rate = sample_rate
+        self._invalidate()
+
+    def get_trace(self):
+        """Return the records held by the trace ring buffer.
+
+        Returns
+        -------
+        records : list of TraceRecord
+            the `parse_id`, `function` name, `parameters` and `result` of
+            the most recent task calls of the traced parses, oldest first.
+        """
+        if self._trace_buffer is None:
+            return []
+        return self._trace_buffer.records()
+
+    def enable_typo_tolerance(self, max_distance=1, min_length=4):
+        """Match keywords and modifiers despite spelling mistakes.
+
+        A token which is not a word of any keyword or modifier, is not a
+        data and is at least `min_length` characters long, is replaced by
+        the word of a keyword or modifier it is at most `max_distance`
+        edits away from. Insertions, deletions, substitutions and swaps of
+        adjacent characters count as one edit each. A token equally close
+        to several words is left as is. `plsu` is then read as `plus`.
+
+        Words are looked up in an index built when the grammar is
+        compiled, so the cost of a lookup does not grow with the number
+        of keywords. It does grow quickly with `max_distance`.
+
+        Parameters
+        ----------
+        max_distance : int
+            maximum number of edits.(Default 1)
+        min_length : int
+            tokens shorter than this are never corrected.(Default 4)
+        """
+        if max_distance <= 0:
+            raise ValueError("max_distance must be a positive integer")
+        self._typo_max_distance = max_distance
+        self._typo_min_length = min_length
+        self._invalidate()
+
+    def disable_typo_tolerance(self):
+        """Only match keywords and modifiers spelled exactly."""
+        self._typo_max_distance = 0
+        self._invalidate()
+
+    def enable_budget(self, max_tokens=None, max_resolver_steps=None,
+                      max_reductions=None, timeout=None, check_arity=True):
+        """Limit the work done by every parse.
+
+        A parse going over one of the limits raises a BudgetExceededError,
+        which is a ValueError, as soon as the limit is reached. Limits
+        which are None are not enforced.
+
+        Parameters
+        ----------
+        max_tokens : int
+            maximum number of tokens in the input.(Default None)
+        max_resolver_steps : int
+            maximum number of rule offsets looked at while resolving the
+            tasks.(Default None)
+        max_reductions : int
+            maximum number of task calls.(Default None)
+        timeout : float
+            maximum number of seconds spent parsing. The time is checked
+            between task calls and regularly while resolving, so a single
+            slow task is not interrupted.(Default None)
+        check_arity : bool
+            whether to reject inputs whose data cannot be enough for the
+            arguments of the tasks they contain, before running any task.
+            Such inputs raise a ValueError.(Default True)
+        """
+        for name, value in (('max_tokens', max_tokens),
+                            ('max_resolver_steps', max_resolver_steps),
+                            ('max_reductions', max_reductions),
+                            ('timeout', timeout)):
+            if value is not None and value < 0:
+                raise ValueError("{0} cannot be negative".format(name))
+        self._budget = ParseBudget(max_tokens, max_resolver_steps,
+                                   max_reductions, timeout, check_arity)
+        self._invalidate()
+
+    def disable_budget(self):
+        """Remove the limits on the work done by every parse."""
+        self._budget = None
+        self._invalidate()
+
+    def enable_metrics(self, hooks=()):
+        """Collect the time spent in each phase of every parse and counts
+        of the work done.
+
+        Parsing with metrics disabled, which is the default, does not
+        measure anything. When enabled, the time spent tokenizing, applying
+        modifiers, evaluating the tasks and running the task functions is
+        measured, along with the number of callback calls, resolver steps,
+        fallbacks to the non-strict rule and failed parses. Totals are
+        returned by :meth:`get_metrics`.
+
+        Parameters
+        ----------
+        hooks : iterable of MetricsHook
+            objects whose `on_parse` method receives the ParseSample of
+            every parse, e.g. to export it to a collector.(Default ())
+
+        Returns
+        -------
+        metrics : ParseMetrics
+            the object holding the totals.
+        """
+        self._metrics = ParseMetrics(hooks)
+        self._invalidate()
+        return self._metrics
+
+    def disable_metrics(self):
+        """Stop collecting metrics and discard the totals."""
+        self._metrics = None
+        self._invalidate()
+
+    def get_metrics(self):
+        """Return the totals of the metrics collected.
+
+        Returns
+        -------
+        totals : dict
+            see :meth:`ParseMetrics.snapshot`, or None if metrics are
+            disabled.
+        """
+        if self._metrics is None:
+            return None
+        return self._metrics.snapshot()
+
+    def save_snapshot(self, path):
+        """Save the grammar of this bot to a versioned JSON snapshot file.
+
+        The snapshot holds the tasks, modifiers, callbacks, tokenizer and
+        cache options, functions being referenced by their import path.
+        Use :func:`botify.load_snapshot` to get a ready to parse bot back
+        without registering every task again.
+
+        Parameters
+        ----------
+        path : str
+            path of the file to write.
+
+        Raises
+        ------
+        ValueError
+            if a function cannot be imported back from its path, like a
+            lambda, or the tokenizer is neither a RegexTokenizer nor
+            importable.
+        """
+        from .snapshot import save_snapshot
+        save_snapshot(self, path)
+
     def parse(self, text):
         """Parse the string `text` and return a tuple of left over Data fields.
 
@@ -132,48 +680,213 @@ class Botify(object):
         result : tuple
             A tuple of left over Data after processing
         """
-        self._parsed_list = []
-        self._most_recent_report = []
-        self._token_list = text.lower().split()
-        modifier_index_list = []
-        for item in self._token_list:
-            
-            if(self._is_token_data_callback(item)):
-                self._parsed_list.append(self._clean_data_callback(item))
-                
-            if item in self._tasks:
-                d = {}
-                d['context'] = self._tasks[item]['context']
-                d['rule'] = self._tasks[item]['rule']
-                d['task'] = item
-                self._parsed_list.append(d)
-
-            if item in self._modifiers:
-                modifier_index_list.append((len(self._parsed_list), item))
-
-        self._apply_modifiers(modifier_index_list)
-        return self._evaluate()
-
-    def _apply_modifiers(self, modifier_index_list):
-        for pos, item in modifier_index_list:
-            for key, action_list in self._modifiers[item].items():
-                for value in action_list:
-                    try:
-                        task_index = pos + value[2]
-                        if value[2] > 0:
-                            task_index -= 1
-                        if self._is_token_data_callback(
-                                self._parsed_list[task_index]):
-                            pass
-                        elif self._parsed_list[task_index]['task'] == key:
-                            action_map = self._get_action_mapping()
-                            action = action_map[value[0]]
-                            if value[1] is None:
-                                action(task_index)
-                            else:
-                                action(task_index, value[1])
-                    except IndexError:
-                        pass
+        return self.parse_session(text).result
+
+    def parse_session(self, text, trace=False):
+        """Parse the string `text` and return the ParseSession used.
+
+        All the state of a parse is kept in the returned session and not on
+        the bot, so this method can safely be called from many threads
+        using the same Botify object.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+        trace : bool
+            whether to record the report of this parse regardless of the
+            trace level.(Default False)
+
+        Returns
+        -------
+        session : ParseSession
+            The session holding the result and the report of the parse.
+        """
+        compiled = self._get_compiled()
+        session = compiled._new_session(text, trace)
+        self._most_recent_session = session
+        compiled._run_session(session)
+        return session
+
+    def parse_async(self, text):
+        """Parse the string `text`, awaiting tasks which are coroutines.
+
+        Task functions may be coroutine functions, or return awaitables,
+        so tasks doing I/O do not block the event loop. Tasks of the same
+        priority which do not depend on each other are awaited
+        concurrently using asyncio.gather. The order of the reductions and
+        therefore the report stays the same as with :meth:`parse`.
+
+        The plan cache is not used by this method.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+
+        Returns
+        -------
+        coroutine
+            A coroutine returning the tuple of left over Data.
+        """
+        return self._get_compiled().parse_async(text)
+
+    def parse_session_async(self, text, trace=False):
+        """Parse the string `text`, awaiting tasks which are coroutines.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+        trace : bool
+            whether to record the report of this parse regardless of the
+            trace level.(Default False)
+
+        Returns
+        -------
+        coroutine
+            A coroutine returning the ParseSession used.
+        """
+        return self._get_compiled().parse_session_async(text, trace)
+
+    def parse_deferred(self, text):
+        """Resolve the tasks of the string `text` without running them.
+
+        The tasks are resolved as by :meth:`parse`, assuming each of them
+        returns a valid data, and the calls are returned as a graph whose
+        leaves are the data found in the text. Identical subexpressions are
+        shared, so `2 times 3 plus 2 times 3` calls multiply once when the
+        graph is run. The graph can be inspected, cached, or run any
+        number of times.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+
+        Returns
+        -------
+        graph : ExpressionGraph
+            The task calls to make. ``graph.run()`` returns the same tuple
+            of left over Data as :meth:`parse`, or raises ValueError if a
+            task returns something which is not a valid data.
+        """
+        return self._get_compiled().parse_deferred(text)
+
+    def parse_stream(self, chunks, separator='', window=32):
+        """Parse the text made of `chunks`, yielding the left over data as
+        soon as they are known.
+
+        The chunks are read one at a time, so a long text like a dictated
+        transcript does not need to be held in memory. Tasks are resolved
+        in the same order as :meth:`parse` would, as soon as the fields
+        they may use have been read, and a data is yielded once no task
+        left can use it::
+
+            for value in bot.parse_stream(open('transcript.txt')):
+                print(value)
+
+        The fields used by a task, including the tasks it depends on, must
+        lie within `window` fields of it. Only about `window` times the
+        number of priorities fields are kept in memory, and the data
+        yielded are the ones :meth:`parse` would return for the whole
+        text. The text is split into tokens at whitespace first, so tokens
+        should never contain whitespace. The grammar used is the one at
+        the time the stream starts.
+
+        Parameters
+        ----------
+        chunks : iterable of str
+            pieces of the text, in order.
+        separator : str
+            string inserted between the chunks, like ``' '`` when every
+            chunk is a single word.(Default '')
+        window : int
+            maximum distance in fields between a task and the fields it
+            uses.(Default 32)
+
+        Yields
+        ------
+        value : object
+            the left over data, in the order of the text.
+
+        Raises
+        ------
+        StreamWindowError
+            if a task uses a field further than `window` fields away from
+            it. The data yielded so far may differ from the ones
+            :meth:`parse` would return.
+        ValueError
+            if the text cannot be parsed. Some data may already have been
+            yielded.
+        """
+        return self._get_compiled().parse_stream(chunks, separator, window)
+
+    def plan_columns(self, text):
+        """Resolve the tasks of the string `text` to run them over columns.
+
+        The text is parsed once, and the task calls made are recorded into
+        a plan whose data are columns, like NumPy arrays. Running the plan
+        calls every task once per row, or once per column for the tasks
+        decorated with :func:`botify.vectorized`, so the same command can
+        be applied to many rows of data without parsing it again::
+
+            plan = bot.plan_columns("2 times 3 plus 4")
+            plan.run(x, y, z)   # x * y + z for every row
+
+        The data of `text` decide how the tasks are resolved and should be
+        representative of the rows, like for the plan cache. Running a
+        plan requires NumPy.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+
+        Returns
+        -------
+        plan : ColumnPlan
+            The plan to run, taking one column for each data of `text`.
+        """
+        return self._get_compiled().plan_columns(text)
+
+    def parse_many(self, texts, executor=EXECUTOR_SERIAL, max_workers=None,
+                   chunksize=None):
+        """Parse every string of `texts`.
+
+        A single failing text does not stop the others from being parsed,
+        the exception it raised is returned in its place instead.
+
+        With the 'process' executor, the compiled grammar is sent to every
+        worker process once, or with every chunk before Python 3.7, so the
+        task functions and callbacks have to be picklable, i.e. defined at
+        the top level of a module. The metrics and the trace records of
+        the parses made by the workers are sent back and added to the ones
+        of this bot, with new parse ids. The 'thread' and 'process'
+        executors need concurrent.futures, which Python 2 only has through
+        the `futures` backport.
+
+        Parameters
+        ----------
+        texts : iterable of str
+            strings to be parsed.
+        executor : str
+            one of 'serial', 'thread' or 'process'.(Default 'serial')
+        max_workers : int
+            number of threads or processes to use. Defaults to the number
+            of CPUs.
+        chunksize : int
+            number of texts sent to a worker at once. By default the texts
+            are split into about four chunks per worker.
+
+        Returns
+        -------
+        outcomes : list of ParseOutcome
+            the `result` or the `error` of parsing each text, in the order
+            of `texts`.
+        """
+        return parse_many(self._get_compiled(), texts, executor,
+                          max_workers, chunksize)
 
     def _get_report(self):
         """Return a list of dicts with parsing info.
@@ -181,114 +894,17 @@ class Botify(object):
         The dicts contain information about how the string was parsed to
         obtain the final result. This information can be used for debugging
         purposes.
+
+        This only describes the most recent parse made by any thread, and
+        is empty unless that parse was traced. Use :meth:`parse_session`
+        to get the report of a particular parse.
         """
-        return self._most_recent_report[:]
-
-    def _evaluate(self):
-        for priority in sorted(self._get_priority_set(),reverse=True):
-            while(True):
-                temp = []
-                offset = 0
-                for index, item in enumerate(self._parsed_list):
-                    if not self._is_token_data_callback(item):
-                        if(item['context'].priority == priority):
-                            temp.append(index-offset)
-                            offset += get_args_count(item['context'].function)
-                if(len(temp) == 0):
-                    break;
-                for task_index in temp:
-                    # While Debugging Uncomment the next line.
-                    # It gives a very detailed output
-                    # print(task_index, temp, self._parsed_list)
-                    
-                    # TODO: use the return value of _find_data
-                    self._find_data(-1, task_index)
-        for item in self._parsed_list:
-            if self._is_token_data_callback(item):
-                pass
-            else:
-                raise ValueError("Unable to Parse")
-        return tuple(self._parsed_list)
-
-    def _find_data(self, caller_index, task_index):
-        # if task_index does not have a dict that means
-        # it has already been evaluated
-        # so we just need to return
-        try:
-            args_count = get_args_count(self._parsed_list[task_index]['context'].function)
-        except (TypeError, IndexError):
-            return False
-        should_repeat = not self.strict_mode_enabled
-        while(True):
-            data_index_list = []
-            rule = self._parsed_list[task_index]['rule']
-            for i in rule:
-                k = task_index + i
-                if  0 <= k < len(self._parsed_list):
-                    if self._is_token_data_callback(self._parsed_list[k]):
-                        data_index_list.append(k)
-                    elif caller_index != k:
-                        # the above check is necessary to prevent recursion cycles
-                        status = self._find_data(task_index,k)
-                        if status is True\
-                           and 0 <= k < len(self._parsed_list)\
-                           and self._is_token_data_callback(self._parsed_list[k])\
-                           and k not in data_index_list:
-                            data_index_list.append(k)
-                    else:
-                        return False
-                if len(data_index_list) == args_count:
-                    break
-            if len(data_index_list) == args_count:
-                self._apply_task(task_index, data_index_list)
-                return True
-            else:
-                if should_repeat:
-                    self._parsed_list[task_index]['rule'] = self._get_nonstrict_rule(task_index)
-                    should_repeat = False
-                else:
-                    raise ValueError('Unable to Parse. Try a different Input')
-
-    def _action_delete(self, task_index, offset):
-        del self._parsed_list[task_index + offset]
-
-    def _action_update_rule(self, task_index, rule):
-        self._parsed_list[task_index]['rule'] = rule
-
-    def _action_update_context(self, task_index, context):
-        self._parsed_list[task_index]['context'] = context
-            
-    def _apply_task(self, task_index, data_index_list):
-        task_context = self._parsed_list[task_index]['context']
-        data_list = [self._parsed_list[index] for index in data_index_list]
-        offset = 0
-        del self._parsed_list[task_index]
-        for index,item in enumerate(data_index_list):
-            if item > task_index:
-                data_index_list[index] -= 1
-            else:
-                offset += 1
-        for index in sorted(data_index_list, reverse=True):
-            del self._parsed_list[index]
-        res = task_context.function(*data_list)
-        self._most_recent_report.append({'function': task_context.function.__name__,
-                                         'parameters': tuple(data_list),
-                                         'result': res})
-        if self._is_token_data_callback(res) is True:
-            self._parsed_list.insert(task_index-offset, res)
-        
-    def _get_default_rule(self, task_index):
-        l = []
-        k = [-1,1]
-        for i in range(get_args_count(self._parsed_list[task_index]['context'].function)):
-            l += list(map(lambda x: (i+1)*x, k))
-        return l
-
-    def _get_nonstrict_rule(self, task_index):
-        strictrule_list = list(self._parsed_list[task_index]['rule'])
-        l = self._get_default_rule(task_index)
-        for item in l:
-            if item not in strictrule_list:
-                strictrule_list.append(item)
-        return tuple(strictrule_list)
-        
+        return self._most_recent_session.report[:]
+
+
+class _GrammarUpdate(object):
+    # The tasks and modifiers added to a Botify by an update, by normalized
+    # keyword, holding the actions added to each modifier.
+    def __init__(self):
+        self.tasks = {}
+        self.modifiers = {}
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+from .utils import _monotonic
+
+
+class ParseBudget(namedtuple('ParseBudget', ('max_tokens',
+                                             'max_resolver_steps',
+                                             'max_reductions', 'timeout',
+                                             'check_arity'))):
+    """Limits on the work done by a single parse.
+
+    A limit which is None is not enforced. `timeout` is in seconds.
+    `check_arity` rejects inputs whose data cannot be enough for the tasks
+    they contain before running any task.
+    """
+    __slots__ = ()
+
+
+# the deadline is checked once every this many resolver steps
+_DEADLINE_INTERVAL = 64
+
+
+class BudgetExceededError(ValueError):
+    """Raised when a parse exceeds one of the limits of its ParseBudget.
+
+    Attributes
+    ----------
+    limit : str
+        the name of the limit, a field of ParseBudget.
+    value : int or float
+        the value of the limit.
+    """
+    def __init__(self, limit, value):
+        ValueError.__init__(self, "Unable to Parse. The input exceeds "
+                                  "{0}={1!r}".format(limit, value))
+        self.limit = limit
+        self.value = value
+
+    def __reduce__(self):
+        return type(self), (self.limit, self.value)
+
+
+class BudgetTracker(object):
+    """Work done by a parse, checked against its ParseBudget."""
+    __slots__ = ('budget', 'steps', 'reductions', 'deadline')
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.steps = 0
+        self.reductions = 0
+        if budget.timeout is None:
+            self.deadline = None
+        else:
+            self.deadline = _monotonic() + budget.timeout
+
+    def check_tokens(self, count):
+        """Check the number of tokens of the input."""
+        max_tokens = self.budget.max_tokens
+        if max_tokens is not None and count > max_tokens:
+            raise BudgetExceededError('max_tokens', max_tokens)
+        self.check_deadline()
+
+    def step(self):
+        """Count a resolver step."""
+        self.steps += 1
+        max_steps = self.budget.max_resolver_steps
+        if max_steps is not None and self.steps > max_steps:
+            raise BudgetExceededError('max_resolver_steps', max_steps)
+        if self.steps % _DEADLINE_INTERVAL == 0:
+            self.check_deadline()
+
+    def reduce(self):
+        """Count a task call."""
+        self.reductions += 1
+        max_reductions = self.budget.max_reductions
+        if max_reductions is not None and self.reductions > max_reductions:
+            raise BudgetExceededError('max_reductions', max_reductions)
+        self.check_deadline()
+
+    def check_deadline(self):
+        """Check that the time given to the parse has not run out."""
+        if self.deadline is not None and _monotonic() > self.deadline:
+            raise BudgetExceededError('timeout', self.budget.timeout)
@@ -0,0 +1,110 @@
+"""Running a resolved parse plan over columns of data using NumPy."""
+from .plan import PlanRecorder
+
+
+def vectorized(function):
+    """Mark `function` as able to take whole NumPy arrays as arguments.
+
+    A ColumnPlan calls such a task once for every step, passing it the
+    columns, where any other task is called once for every row.
+
+    Returns
+    -------
+    function
+        the same function.
+    """
+    function.vectorized = True
+    return function
+
+
+class ColumnPlan(object):
+    """A plan of task calls to run over columns of data.
+
+    Created by :meth:`Botify.plan_columns`. Each data of the text used to
+    create the plan is a column, the task calls resolved for the text are
+    made on whole columns.
+
+    Attributes
+    ----------
+    text : str
+        The text the plan was resolved for.
+    columns : int
+        The number of columns, i.e. of data found in the text.
+    plan : Plan
+        The task calls made.
+    """
+    def __init__(self, text, plan, columns):
+        self.text = text
+        self.plan = plan
+        self.columns = columns
+
+    def __repr__(self):
+        return '{0}(text={1!r}, columns={2!r})'.format(
+            type(self).__name__, self.text, self.columns)
+
+    def run(self, *columns):
+        """Run the plan over `columns`.
+
+        Parameters
+        ----------
+        *columns : array_like
+            one array for each data of the text, in the order they appear
+            in it. Columns are broadcast against each other, so a scalar can
+            be used for a data which is the same on every row.
+
+        Returns
+        -------
+        result : tuple of numpy.ndarray
+            one array for each left over data.
+
+        Raises
+        ------
+        ValueError
+            if the number of columns is not the number of data of the text.
+        """
+        import numpy as np
+
+        if len(columns) != self.columns:
+            raise ValueError("Expected {0} columns, got {1}".format(
+                self.columns, len(columns)))
+        columns = [np.asarray(column) for column in columns]
+        values = [columns[slot] for slot in self.plan.data_slots]
+        for step in self.plan.steps:
+            args = [values[slot] for slot in step.args]
+            res = _call(step.function, args)
+            if step.result_is_data:
+                values.append(res)
+        return tuple(values[slot] for slot in self.plan.result_slots)
+
+
+def _call(function, args):
+    import numpy as np
+
+    if getattr(function, 'vectorized', False):
+        return np.asarray(function(*args))
+    if not args:
+        return np.asarray(function())
+    rows = np.frompyfunc(function, len(args), 1)(*args)
+    if not isinstance(rows, np.ndarray):
+        # all the arguments were scalars
+        return np.asarray(rows)
+    return np.array(rows.tolist())
+
+
+def plan_columns(bot, text):
+    """Resolve the tasks of `text` using `bot` into a ColumnPlan.
+
+    The text is parsed once with its own data, which decide how the tasks
+    are resolved, like for the plan cache.
+    """
+    session = bot._new_session(text)
+    try:
+        modifier_index_list, _, positions, data_values = bot._tokenize(
+            session, True)
+        session.recorder = PlanRecorder(positions)
+        bot._apply_modifiers(session, modifier_index_list)
+        session.result = bot._evaluate(session)
+    finally:
+        bot._end_session(session)
+    return ColumnPlan(text, session.recorder.get_plan(session.nodes),
+                      len(data_values))
@@ -0,0 +1,909 @@
+from collections import namedtuple
+import itertools
+
+from .budget import BudgetTracker
+from .engine import (KIND_DATA, KIND_TASK, Node, NodeList, TaskNode,
+                     is_linked)
+from .metrics import (PHASE_EVALUATE, PHASE_MODIFIERS, PHASE_PLAN,
+                      PHASE_TASKS, PHASE_TOKENIZE, _timer)
+from .plan import PlanRecorder
+from .session import ParseSession
+from .trace import TRACE_FULL, TRACE_OFF, TraceRecord
+from .typo import TypoIndex
+from .tokenizer import (TOKEN_DATA, KeywordTrie, RegexTokenizer,
+                        normalize_keyword)
+from .utils import LRUCache, get_args_count
+
+_MISSING = object()
+
+TaskDef = namedtuple('TaskDef', ('context', 'rule', 'arity', 'keyword'))
+
+ModifierIssue = namedtuple('ModifierIssue', ('modifier', 'keyword',
+                                             'relative_pos', 'message'))
+
+
+class CompiledBot(object):
+    """Immutable, ready to parse form of a Botify grammar.
+
+    A CompiledBot is created using :meth:`Botify.compile`. It freezes the
+    registered tasks and modifiers and precomputes everything which does
+    not depend on the text being parsed, i.e. the number of arguments of
+    every task function, the order in which priorities are evaluated and
+    the callables implementing modifier actions.
+
+    Parsing with a CompiledBot yields exactly the same results as parsing
+    with the Botify object it was created from.
+
+    Attributes
+    ----------
+    modifier_issues : tuple of ModifierIssue
+        modifiers which can never be applied, or whose actions conflict
+        with each other.
+    version : int
+        version of the grammar which was compiled.
+
+    Parameters
+    ----------
+    tasks : dict
+        mapping of keywords to dicts with `context` and `rule` keys.
+    modifiers : dict
+        mapping of modifiers to dicts of keywords and action tuples.
+    is_token_data_callback : function
+        A function to determine whether a string token is a valid data.
+    clean_data_callback : function
+        A function to generate the parameters for the tasks from data tokens.
+    strict_mode_enabled : bool
+        whether strict mode is enabled.
+    plan_cache_size : int
+        maximum number of parse plans to cache, 0 disables the cache.
+        (Default 0)
+    token_cache_size : int
+        maximum number of tokens for which the results of the callbacks
+        are cached, 0 disables the cache.(Default 0)
+    tokenizer : function
+        A function returning the ``(start, end, kind)`` spans of the tokens
+        of a text. Defaults to a RegexTokenizer.
+    trace_level : str
+        one of TRACE_OFF, TRACE_SAMPLED or TRACE_FULL.(Default TRACE_OFF)
+    trace_sample_rate : int
+        with TRACE_SAMPLED, one parse in `trace_sample_rate` is traced.
+        (Default 100)
+    trace_buffer : TraceBuffer
+        buffer receiving the records of the traced parses.(Default None)
+    metrics : ParseMetrics
+        object collecting the metrics of every parse, None disables
+        metrics.(Default None)
+    result_cache_size : int
+        maximum number of results of pure tasks to cache, 0 disables the
+        cache.(Default 0)
+    result_cache_ttl : float
+        number of seconds a cached result is kept for, None to keep it
+        until it is evicted.(Default None)
+    budget : ParseBudget
+        limits on the work done by every parse, None for no limits.
+        (Default None)
+    typo_max_distance : int
+        maximum edit distance of the misspelled keywords which are
+        corrected, 0 disables typo correction.(Default 0)
+    typo_min_length : int
+        tokens shorter than this are never corrected.(Default 4)
+    version : int
+        version of the grammar, see :meth:`Botify.bulk_update`.(Default 0)
+    """
+    def __init__(self, tasks, modifiers, is_token_data_callback,
+                 clean_data_callback, strict_mode_enabled=True,
+                 plan_cache_size=0, token_cache_size=0, tokenizer=None,
+                 trace_level=TRACE_OFF, trace_sample_rate=100,
+                 trace_buffer=None, metrics=None, result_cache_size=0,
+                 result_cache_ttl=None, budget=None, typo_max_distance=0,
+                 typo_min_length=4, version=0):
+        self.trace_level = trace_level
+        self._trace_sample_rate = trace_sample_rate
+        self._trace_buffer = trace_buffer
+        self._parse_ids = itertools.count(1)
+        self._metrics = metrics
+        self._budget = budget
+        self._is_token_data_callback = is_token_data_callback
+        self._clean_data_callback = clean_data_callback
+        if tokenizer is None:
+            tokenizer = RegexTokenizer()
+        self._tokenizer = tokenizer
+        self.strict_mode_enabled = strict_mode_enabled
+        if plan_cache_size:
+            self._plan_cache = LRUCache(plan_cache_size)
+        else:
+            self._plan_cache = None
+        if token_cache_size:
+            self._token_cache = LRUCache(token_cache_size)
+        else:
+            self._token_cache = None
+        if result_cache_size:
+            self._result_cache = LRUCache(result_cache_size, result_cache_ttl)
+        else:
+            self._result_cache = None
+        self._arity = {}
+        self.version = version
+
+        self._priority_counts = {}
+        self._tasks = {}
+        for keyword, task in tasks.items():
+            self._add_task(normalize_keyword(keyword, tokenizer), task)
+
+        # Modifiers are indexed by (modifier, relative_pos, keyword), so a
+        # modifier found in the text needs a single lookup for each of the
+        # distinct relative positions it targets.
+        self._modifiers = {}
+        self._modifier_actions = {}
+        self._modifier_updates = {}
+        for modifier, modifier_dict in modifiers.items():
+            self._add_modifier(normalize_keyword(modifier, tokenizer),
+                               modifier_dict)
+        self._modifier_issues = None
+
+        self._phrases = KeywordTrie(self._tasks)
+        for modifier in self._modifiers:
+            self._phrases.add(modifier)
+        if typo_max_distance:
+            self._typos = TypoIndex(max_distance=typo_max_distance,
+                                    min_length=typo_min_length)
+            for keyword in itertools.chain(self._tasks, self._modifiers):
+                for word in keyword.split():
+                    self._typos.add(word)
+        else:
+            self._typos = None
+        self._priorities = self._get_priorities()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # itertools.count cannot be pickled from Python 3.14 on, a copy
+        # goes on numbering its parses from the next id instead
+        state['_parse_ids'] = next(self._parse_ids)
+        # Python 2 cannot pickle methods, actions are saved by name
+        state['_modifier_actions'] = dict(
+            (key, tuple((action.__name__, parameter)
+                        for action, parameter in actions))
+            for key, actions in self._modifier_actions.items())
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._parse_ids = itertools.count(state['_parse_ids'])
+        cls = type(self)
+        self._modifier_actions = dict(
+            (key, tuple((getattr(cls, name), parameter)
+                        for name, parameter in actions))
+            for key, actions in state['_modifier_actions'].items())
+
+    @property
+    def modifier_issues(self):
+        issues = self._modifier_issues
+        if issues is None:
+            issues = self._modifier_issues = self._check_modifiers(
+                self._modifier_updates)
+        return issues
+
+    def _count_priority(self, priority, count):
+        counts = self._priority_counts
+        counts[priority] = counts.get(priority, 0) + count
+        if not counts[priority]:
+            del counts[priority]
+
+    def _get_priorities(self):
+        return tuple(sorted(self._priority_counts, reverse=True))
+
+    def _add_task(self, keyword, task):
+        context = task['context']
+        previous = self._tasks.get(keyword)
+        if previous is not None:
+            self._count_priority(previous.context.priority, -1)
+        self._tasks[keyword] = TaskDef(context, tuple(task['rule']),
+                                       self._get_arity(context.function),
+                                       keyword)
+        self._count_priority(context.priority, 1)
+
+    def _add_modifier(self, modifier, modifier_dict):
+        # the functions are stored unbound, so the indexes can be shared
+        # with the CompiledBot objects made by updated
+        cls = type(self)
+        action_map = {'delete': cls._action_delete,
+                      'update_rule': cls._action_update_rule,
+                      'update_context': cls._action_update_context,
+        }
+        offsets = list(self._modifiers.get(modifier, ()))
+        for keyword, values in modifier_dict.items():
+            keyword = normalize_keyword(keyword, self._tokenizer)
+            for action, parameter, relative_pos in values:
+                if action == 'update_context':
+                    self._get_arity(parameter.function)
+                    self._count_priority(parameter.priority, 1)
+                if relative_pos not in offsets:
+                    offsets.append(relative_pos)
+                key = (modifier, relative_pos, keyword)
+                self._modifier_actions[key] = (
+                    self._modifier_actions.get(key, ())
+                    + ((action_map[action], parameter),))
+                if action != 'delete':
+                    updates = self._modifier_updates
+                    updates[key + (action,)] = (
+                        updates.get(key + (action,), ()) + (parameter,))
+        self._modifiers[modifier] = tuple(offsets)
+
+    def _remove_modifier(self, modifier, keywords):
+        # Remove the actions of `modifier` on `keywords` from the indexes.
+        update_context = type(self)._action_update_context
+        for relative_pos in self._modifiers.pop(modifier, ()):
+            for keyword in keywords:
+                keyword = normalize_keyword(keyword, self._tokenizer)
+                key = (modifier, relative_pos, keyword)
+                for action, parameter in self._modifier_actions.pop(key, ()):
+                    if action == update_context:
+                        self._count_priority(parameter.priority, -1)
+                self._modifier_updates.pop(key + ('update_rule',), None)
+                self._modifier_updates.pop(key + ('update_context',), None)
+
+    def updated(self, tasks, modifiers, task_keywords=(),
+                modifier_keywords=(), version=None):
+        """Return a CompiledBot for a grammar differing from this one only
+        in the given keywords.
+
+        Only the changed tasks and modifiers are compiled, everything else
+        is shared with this object, which is left unchanged and can still
+        be used to parse. The token and result caches are shared, and the
+        cached plans are kept unless their input contains one of the
+        changed keywords.
+
+        Parameters
+        ----------
+        tasks : dict
+            mapping of keywords to dicts with `context` and `rule` keys,
+            holding every task of the new grammar.
+        modifiers : dict
+            mapping of modifiers to dicts of keywords and action tuples,
+            holding every modifier of the new grammar.
+        task_keywords : iterable of str
+            normalized keywords of the tasks added or replaced.
+        modifier_keywords : iterable of str
+            normalized modifiers which were added or have new actions.
+        version : int
+            version of the new grammar. Defaults to one more than the
+            version of this object.
+
+        Returns
+        -------
+        compiled : CompiledBot
+            the compiled new grammar.
+        """
+        task_keywords = set(task_keywords)
+        modifier_keywords = set(modifier_keywords)
+        # The attributes are copied directly rather than through pickling
+        # support. The parses of every version are numbered together.
+        compiled = type(self).__new__(type(self))
+        compiled.__dict__.update(self.__dict__)
+        compiled.version = self.version + 1 if version is None else version
+        compiled._arity = dict(self._arity)
+        compiled._priority_counts = dict(self._priority_counts)
+        compiled._tasks = dict(self._tasks)
+        compiled._modifiers = dict(self._modifiers)
+        compiled._modifier_actions = dict(self._modifier_actions)
+        compiled._modifier_updates = dict(self._modifier_updates)
+        compiled._modifier_issues = None
+
+        for keyword in task_keywords:
+            compiled._add_task(keyword, tasks[keyword])
+        for modifier in modifier_keywords:
+            modifier_dict = modifiers[modifier]
+            compiled._remove_modifier(modifier, modifier_dict)
+            compiled._add_modifier(modifier, modifier_dict)
+        compiled._priorities = compiled._get_priorities()
+
+        added = [keyword for keyword in task_keywords
+                 if keyword not in self._tasks
+                 and keyword not in self._modifiers]
+        added += [modifier for modifier in modifier_keywords
+                  if modifier not in self._tasks
+                  and modifier not in self._modifiers]
+        compiled._phrases = self._phrases.extended(added)
+        if self._typos is not None and added:
+            compiled._typos = self._typos.copy()
+            for keyword in added:
+                for word in keyword.split():
+                    compiled._typos.add(word)
+
+        if self._plan_cache is not None:
+            # a plan only depends on the keywords of its input
+            changed = task_keywords | modifier_keywords
+            compiled._plan_cache = self._plan_cache.copy(
+                lambda shape: changed.isdisjoint(shape))
+        return compiled
+
+    def _check_modifiers(self, updates):
+        issues = []
+        for modifier, relative_pos, keyword in sorted(self._modifier_actions,
+                                                      key=repr):
+            if keyword not in self._tasks:
+                issues.append(ModifierIssue(
+                    modifier, keyword, relative_pos,
+                    "'{0}' is not a task keyword, the modifier is never "
+                    "applied".format(keyword)))
+        for key, parameters in sorted(updates.items(), key=repr):
+            modifier, relative_pos, keyword, action = key
+            if any(parameter != parameters[0] for parameter in parameters):
+                issues.append(ModifierIssue(
+                    modifier, keyword, relative_pos,
+                    "conflicting '{0}' actions, only the last one has an "
+                    "effect".format(action)))
+        return tuple(issues)
+
+    def plan_cache_info(self):
+        """Return the statistics of the plan cache.
+
+        See :meth:`Botify.plan_cache_info`.
+        """
+        if self._plan_cache is None:
+            return None
+        return self._plan_cache.info()
+
+    def token_cache_info(self):
+        """Return the statistics of the token cache.
+
+        See :meth:`Botify.token_cache_info`.
+        """
+        if self._token_cache is None:
+            return None
+        return self._token_cache.info()
+
+    def result_cache_info(self):
+        """Return the statistics of the result cache.
+
+        See :meth:`Botify.result_cache_info`.
+        """
+        if self._result_cache is None:
+            return None
+        return self._result_cache.info()
+
+    def _get_arity(self, function):
+        try:
+            return self._arity[function]
+        except KeyError:
+            count = self._arity[function] = get_args_count(function)
+            return count
+
+    def parse(self, text):
+        """Parse the string `text` and return a tuple of left over Data fields.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+
+        Returns
+        -------
+        result : tuple
+            A tuple of left over Data after processing
+        """
+        return self.parse_session(text).result
+
+    def parse_session(self, text, trace=False):
+        """Parse the string `text` and return the ParseSession used.
+
+        Parameters
+        ----------
+        text : str
+            A string to be parsed
+        trace : bool
+            whether to record the report of this parse regardless of the
+            trace level.(Default False)
+
+        Returns
+        -------
+        session : ParseSession
+            The session holding the result and the report of the parse.
+        """
+        session = self._new_session(text, trace)
+        self._run_session(session)
+        return session
+
+    def _new_session(self, text, trace=False):
+        parse_id = next(self._parse_ids)
+        level = self.trace_level
+        if not trace and level != TRACE_OFF:
+            trace = (level == TRACE_FULL
+                     or parse_id % self._trace_sample_rate == 0)
+        metrics = self._metrics
+        if metrics is not None:
+            metrics = metrics.new_sample(parse_id)
+        budget = self._budget
+        if budget is not None:
+            budget = BudgetTracker(budget)
+        return ParseSession(text, parse_id, trace, metrics, budget)
+
+    def _run_session(self, session):
+        try:
+            self._run(session)
+        finally:
+            self._end_session(session)
+
+    def _end_session(self, session):
+        if session.trace and self._trace_buffer is not None:
+            self._trace_buffer.extend(session.trace)
+        if session.metrics is not None:
+            session.metrics.failed = session.result is None
+            self._metrics.add_sample(session.metrics)
+
+    def parse_async(self, text):
+        """Parse the string `text`, awaiting tasks which are coroutines.
+
+        See :meth:`Botify.parse_async`.
+
+        Returns
+        -------
+        coroutine
+            A coroutine returning the tuple of left over Data.
+        """
+        from .aio import parse_async
+        return parse_async(self, text)
+
+    def parse_session_async(self, text, trace=False):
+        """Parse the string `text`, awaiting tasks which are coroutines.
+
+        See :meth:`Botify.parse_session_async`.
+        """
+        from .aio import parse_session_async
+        return parse_session_async(self, text, trace)
+
+    def parse_deferred(self, text):
+        """Resolve the tasks of the string `text` without running them.
+
+        See :meth:`Botify.parse_deferred`.
+
+        Returns
+        -------
+        graph : ExpressionGraph
+            The task calls to make, which are run by ``graph.run()``.
+        """
+        from .deferred import parse_deferred
+        return parse_deferred(self, text)
+
+    def plan_columns(self, text):
+        """Resolve the tasks of the string `text` into a ColumnPlan.
+
+        See :meth:`Botify.plan_columns`.
+        """
+        from .columnar import plan_columns
+        return plan_columns(self, text)
+
+    def parse_stream(self, chunks, separator='', window=32):
+        """Parse the text made of `chunks`, yielding the left over data as
+        soon as they are known.
+
+        See :meth:`Botify.parse_stream`.
+        """
+        from .stream import parse_stream
+        return parse_stream(self, chunks, separator, window)
+
+    def _classify_token(self, token, kind, metrics=None):
+        # Return whether `token` is a data and its cleaned value.
+        cache = self._token_cache
+        if cache is not None:
+            entry = cache.get(token)
+            if entry is not None:
+                return entry
+        if kind is TOKEN_DATA or self._is_token_data_callback(token):
+            entry = (True, self._clean_data_callback(token))
+            if metrics is not None:
+                metrics.callback_calls += 1 if kind is TOKEN_DATA else 2
+        else:
+            entry = (False, None)
+            if metrics is not None:
+                metrics.callback_calls += 1
+        if cache is not None:
+            cache.put(token, entry)
+        return entry
+
+    def _split_text(self, session, text, token_count=0):
+        # Set session.tokens to the lowercase tokens of `text`, misspelled
+        # keyword words being corrected, and return their spans.
+        # `token_count` tokens of the same parse were split before.
+        spans = self._tokenizer(text)
+        if session.budget is not None:
+            session.budget.check_tokens(token_count + len(spans))
+        session.tokens = [text[start:end].lower() for start, end, _ in spans]
+        if self._typos is not None:
+            self._correct_typos(session, spans)
+        return spans
+
+    def _read_fields(self, tokens, spans, limit, metrics=None):
+        # Yield the fields starting before `limit` in `tokens`, as the index
+        # of the token following the field, the token or phrase read,
+        # whether it is a data and its cleaned value.
+        phrases = self._phrases
+        i = 0
+        while i < limit:
+            item = tokens[i]
+            kind = spans[i][2]
+            i += 1
+
+            if item in phrases:
+                end, phrase = phrases.match(tokens, i - 1)
+                if phrase is not None:
+                    # the words of a phrase are never data
+                    i = end
+                    yield i, phrase, False, None
+                    continue
+            is_data, data = self._classify_token(item, kind, metrics)
+            yield i, item, is_data, data
+
+    def _tokenize(self, session, record_shape=False):
+        parsed_list = session.parsed_list
+        modifier_index_list = []
+        if record_shape:
+            shape = []
+            positions = {}
+            data_values = []
+        else:
+            shape = positions = data_values = None
+        spans = self._split_text(session, session.text)
+        tokens = session.tokens
+        for _, item, is_data, data in self._read_fields(tokens, spans,
+                                                        len(tokens),
+                                                        session.metrics):
+            if is_data:
+                node = Node(data, KIND_DATA)
+                parsed_list.append(node)
+                if record_shape:
+                    shape.append(None)
+                    positions[node] = len(data_values)
+                    data_values.append(data)
+
+            if item in self._tasks:
+                parsed_list.append(TaskNode(self._tasks[item]))
+
+            if item in self._modifiers:
+                modifier_index_list.append((len(parsed_list), item))
+
+            if record_shape and (item in self._tasks
+                                 or item in self._modifiers):
+                shape.append(item)
+
+        return modifier_index_list, shape, positions, data_values
+
+    def _correct_typos(self, session, spans):
+        # Replace the tokens which are misspelled keyword words, unless
+        # they are data.
+        typos = self._typos
+        tokens = session.tokens
+        for i, token in enumerate(tokens):
+            kind = spans[i][2]
+            if token in typos or kind is TOKEN_DATA:
+                continue
+            word = typos.lookup(token)
+            if (word is not None
+                    and not self._classify_token(token, kind,
+                                                 session.metrics)[0]):
+                tokens[i] = word
+
+    def _run(self, session):
+        plan_cache = self._plan_cache
+        metrics = session.metrics
+        modifier_index_list, shape, positions, data_values = self._tokenize(
+            session, plan_cache is not None)
+        if metrics is not None:
+            metrics.lap(PHASE_TOKENIZE)
+
+        if plan_cache is not None:
+            shape = tuple(shape)
+            plan = plan_cache.get(shape)
+            if plan is not None:
+                done = self._run_plan(session, plan, data_values)
+                if metrics is not None:
+                    metrics.lap(PHASE_PLAN)
+                if done:
+                    return
+            session.recorder = PlanRecorder(positions)
+
+        self._apply_modifiers(session, modifier_index_list)
+        if metrics is not None:
+            metrics.lap(PHASE_MODIFIERS)
+        try:
+            session.result = self._evaluate(session)
+        finally:
+            if metrics is not None:
+                metrics.lap(PHASE_EVALUATE)
+
+        if plan_cache is not None:
+            plan_cache.put(shape, session.recorder.get_plan(session.nodes))
+
+    def _run_plan(self, session, plan, data_values):
+        metrics = session.metrics
+        values = [data_values[slot] for slot in plan.data_slots]
+        for step in plan.steps:
+            if session.budget is not None:
+                session.budget.reduce()
+            data_list = [values[slot] for slot in step.args]
+            if metrics is None:
+                res = self._call_task(step.function, step.pure, data_list)
+            else:
+                start = _timer()
+                res = self._call_task(step.function, step.pure, data_list)
+                metrics.add_time(PHASE_TASKS, _timer() - start)
+                metrics.task_calls += 1
+                metrics.callback_calls += 1
+            if session.trace is not None:
+                session.trace.append(TraceRecord(session.parse_id,
+                                                 step.function.__name__,
+                                                 tuple(data_list), res))
+            if (self._is_token_data_callback(res) is True) != step.result_is_data:
+                # the input does not fit the plan, it has to be parsed
+                if session.trace is not None:
+                    session.trace = []
+                return False
+            if step.result_is_data:
+                values.append(res)
+        session.result = tuple(values[slot] for slot in plan.result_slots)
+        return True
+
+    def _apply_modifiers(self, session, modifier_index_list):
+        parsed_list = session.parsed_list
+        modifier_actions = self._modifier_actions
+        for pos, item in modifier_index_list:
+            for relative_pos in self._modifiers[item]:
+                task_index = pos + relative_pos
+                if relative_pos > 0:
+                    task_index -= 1
+                if not 0 <= task_index < len(parsed_list):
+                    continue
+                node = parsed_list[task_index]
+                if node.kind is KIND_DATA:
+                    continue
+                actions = modifier_actions.get(
+                    (item, relative_pos, node.keyword))
+                if actions is None:
+                    continue
+                for action, parameter in actions:
+                    if (task_index >= len(parsed_list)
+                            or parsed_list[task_index] is not node):
+                        # the target has been deleted by a previous action
+                        break
+                    if parameter is None:
+                        action(self, session, task_index)
+                    else:
+                        action(self, session, task_index, parameter)
+
+    def _get_buckets(self, session):
+        nodes = session.nodes = NodeList(session.parsed_list)
+        if session.recorder is not None:
+            session.recorder.bind(nodes)
+        buckets = {}
+        data_count = task_count = args_count = 0
+        for node in nodes:
+            if node.kind is KIND_TASK:
+                priority = node.context.priority
+                try:
+                    buckets[priority].append(node)
+                except KeyError:
+                    buckets[priority] = [node]
+                task_count += 1
+                args_count += self._arity[node.context.function]
+            else:
+                data_count += 1
+        if (session.budget is not None and session.budget.budget.check_arity
+                and task_count and args_count > data_count + task_count - 1):
+            # every task result but the last one can at best be used as
+            # data by another task
+            raise ValueError("Unable to Parse. The tasks need more data "
+                             "than the input holds")
+        return buckets
+
+    def _get_result(self, session):
+        for node in session.nodes:
+            if node.kind is not KIND_DATA:
+                raise ValueError("Unable to Parse")
+        return tuple(session.nodes.items())
+
+    def _evaluate(self, session):
+        buckets = self._get_buckets(session)
+        for priority in self._priorities:
+            for node in buckets.get(priority, ()):
+                self._find_data(session, node)
+        return self._get_result(session)
+
+    def _new_frame(self, node, caller):
+        return _Frame(node, caller, node.rule,
+                      self._arity[node.context.function],
+                      not self.strict_mode_enabled)
+
+    def _find_data(self, session, root):
+        """Resolve and apply the task at `root` and the tasks it depends on."""
+        for node, data_nodes in self._resolve(session, root):
+            self._apply_task(session, node, data_nodes)
+
+    def _resolve(self, session, root):
+        """Resolve the task at `root` along with the tasks it depends on.
+
+        Neighbouring tasks found through the rule of a task are resolved
+        before it. Instead of recursing, the tasks being resolved are kept
+        on an explicit stack, so the stack depth of Python does not grow
+        with the length of the input. A task which is reached again while
+        it is still being resolved ends the resolution of the task reaching
+        it, and a task which failed this way is not retried until another
+        task has been applied.
+
+        This is a generator yielding a task node along with the data nodes
+        to be passed to it, whenever a task is ready to be applied. The
+        task has to be applied before the generator is resumed.
+        """
+        # if the node has been unlinked or does not have a dict
+        # that means it has already been evaluated
+        # so we just need to return
+        if not is_linked(root) or root.kind is KIND_DATA:
+            return
+        nodes = session.nodes
+        active = set([root])
+        failed = {}
+        generation = 0
+        stack = [self._new_frame(root, None)]
+        status = None
+        metrics = session.metrics
+        budget = session.budget
+        while stack:
+            frame = stack[-1]
+            node = frame.node
+            if status is not None:
+                # returning from the neighbour at frame.rule[frame.pos]
+                if status is True:
+                    # the neighbour has been replaced by its result
+                    # or removed, so look at the position again
+                    k = nodes.walk(node, frame.rule[frame.pos])
+                    if (k is not None
+                            and k.kind is KIND_DATA
+                            and k not in frame.data_nodes):
+                        frame.data_nodes.append(k)
+                status = None
+                frame.pos += 1
+            elif frame.pos < len(frame.rule):
+                if metrics is not None:
+                    metrics.resolver_steps += 1
+                if budget is not None:
+                    budget.step()
+                k = nodes.walk(node, frame.rule[frame.pos])
+                if k is not None:
+                    if k.kind is KIND_DATA:
+                        # once a neighbour has been applied, two offsets
+                        # of the rule may lead to the same node
+                        if k not in frame.data_nodes:
+                            frame.data_nodes.append(k)
+                    elif k is frame.caller or k in active:
+                        # the task is already being resolved, going
+                        # further would lead to a cycle
+                        active.discard(node)
+                        failed[node] = generation
+                        stack.pop()
+                        status = False
+                        continue
+                    elif failed.get(k) != generation:
+                        active.add(k)
+                        stack.append(self._new_frame(k, node))
+                        continue
+                frame.pos += 1
+            if (len(frame.data_nodes) == frame.args_count
+                    or frame.pos >= len(frame.rule)):
+                # the tasks applied while resolving a neighbour, however
+                # deep, may have taken data nodes collected before it
+                frame.data_nodes = [n for n in frame.data_nodes
+                                    if is_linked(n)]
+                if len(frame.data_nodes) == frame.args_count:
+                    yield node, frame.data_nodes
+                    generation += 1
+                    active.discard(node)
+                    stack.pop()
+                    status = True
+                elif frame.pos < len(frame.rule):
+                    continue
+                elif frame.should_repeat:
+                    if metrics is not None:
+                        metrics.nonstrict_fallbacks += 1
+                    frame.rule = node.rule = self._get_nonstrict_rule(node)
+                    frame.pos = 0
+                    frame.data_nodes = []
+                    frame.should_repeat = False
+                else:
+                    raise ValueError('Unable to Parse. Try a different Input')
+
+    def _action_delete(self, session, task_index, offset):
+        index = task_index + offset
+        if 0 <= index < len(session.parsed_list):
+            del session.parsed_list[index]
+
+    def _action_update_rule(self, session, task_index, rule):
+        session.parsed_list[task_index].rule = rule
+
+    def _action_update_context(self, session, task_index, context):
+        session.parsed_list[task_index].context = context
+
+    def _apply_task(self, session, node, data_nodes):
+        task_context, data_list = self._take_task(session, node, data_nodes)
+        function, pure = task_context.function, task_context.pure
+        if session.metrics is None:
+            res = self._call_task(function, pure, data_list)
+        else:
+            start = _timer()
+            res = self._call_task(function, pure, data_list)
+            session.metrics.add_time(PHASE_TASKS, _timer() - start)
+        self._finish_task(session, node, data_nodes, task_context, data_list,
+                          res)
+
+    def _call_task(self, function, pure, data_list):
+        cache = self._result_cache
+        if cache is None or not pure:
+            return function(*data_list)
+        # 1, 1.0 and True are equal, but a task may not return the same
+        # result for each of them
+        key = (function, tuple(data_list),
+               tuple(type(data) for data in data_list))
+        try:
+            res = cache.get(key, _MISSING)
+        except TypeError:
+            # unhashable arguments, the result is not cached
+            return function(*data_list)
+        if res is _MISSING:
+            res = function(*data_list)
+            cache.put(key, res)
+        return res
+
+    def _take_task(self, session, node, data_nodes):
+        if session.budget is not None:
+            session.budget.reduce()
+        nodes = session.nodes
+        task_context = node.context
+        data_list = [data_node.item for data_node in data_nodes]
+        for data_node in data_nodes:
+            nodes.remove(data_node)
+        return task_context, data_list
+
+    def _finish_task(self, session, node, data_nodes, task_context, data_list,
+                     res):
+        if session.trace is not None:
+            session.trace.append(TraceRecord(session.parse_id,
+                                             task_context.function.__name__,
+                                             tuple(data_list), res))
+        is_data = self._is_token_data_callback(res) is True
+        if session.metrics is not None:
+            session.metrics.task_calls += 1
+            session.metrics.callback_calls += 1
+        if session.recorder is not None:
+            session.recorder.record(node, data_nodes, task_context.function,
+                                    is_data, task_context.pure)
+        if is_data:
+            node.set_result(res)
+        else:
+            session.nodes.remove(node)
+
+    def _get_default_rule(self, node):
+        l = []
+        k = [-1, 1]
+        for i in range(self._arity[node.context.function]):
+            l += list(map(lambda x: (i+1)*x, k))
+        return l
+
+    def _get_nonstrict_rule(self, node):
+        strictrule_list = list(node.rule)
+        l = self._get_default_rule(node)
+        for item in l:
+            if item not in strictrule_list:
+                strictrule_list.append(item)
+        return tuple(strictrule_list)
+
+
+class _Frame(object):
+    """A task waiting for its data while resolving dependencies."""
+    __slots__ = ('node', 'caller', 'rule', 'pos', 'data_nodes',
+                 'args_count', 'should_repeat')
+
+    def __init__(self, node, caller, rule, args_count, should_repeat):
+        self.node = node
+        self.caller = caller
+        self.rule = rule
+        self.pos = 0
+        self.data_nodes = []
+        self.args_count = args_count
+        self.should_repeat = should_repeat
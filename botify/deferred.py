@@ -0,0 +1,161 @@
+"""Deferred parsing into a graph of task calls which is run later."""
+from .engine import KIND_DATA
+from .metrics import PHASE_EVALUATE, PHASE_MODIFIERS, PHASE_TOKENIZE
+
+
+class Expression(object):
+    """A node of an ExpressionGraph.
+
+    A leaf holds a data `value` taken from the text, any other node holds
+    the task `function` to call with the values of its `args`.
+    """
+    __slots__ = ('function', 'args', 'value')
+
+    def __init__(self, function=None, args=(), value=None):
+        self.function = function
+        self.args = args
+        self.value = value
+
+    @property
+    def is_leaf(self):
+        """Whether the node is a data value."""
+        return self.function is None
+
+    def __repr__(self):
+        if self.is_leaf:
+            return repr(self.value)
+        return '{0}({1})'.format(self.function.__name__,
+                                 ', '.join(repr(arg) for arg in self.args))
+
+
+class ExpressionGraph(object):
+    """The task calls resolved for a text, without having run any of them.
+
+    Identical subexpressions, i.e. equal data values or calls of the same
+    function with the same arguments, are a single node of the graph, so
+    they are only run once. Tasks are assumed to be pure.
+
+    Attributes
+    ----------
+    roots : tuple of Expression
+        one expression for each of the left over data of the parse.
+    nodes : list of Expression
+        every distinct node of the graph, any node coming after the nodes
+        it depends on.
+    """
+    def __init__(self, is_token_data_callback):
+        self._is_token_data_callback = is_token_data_callback
+        self._index = {}
+        self.nodes = []
+        self.roots = ()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__,
+                                 ', '.join(repr(root) for root in self.roots))
+
+    def _add(self, key, function, args, value):
+        if key is not None:
+            try:
+                return self._index[key]
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable value, never shared
+                key = None
+        node = Expression(function, args, value)
+        self.nodes.append(node)
+        if key is not None:
+            self._index[key] = node
+        return node
+
+    def leaf(self, value):
+        """Return the node holding the data `value`."""
+        return self._add(('leaf', type(value), value), None, (), value)
+
+    def call(self, function, args):
+        """Return the node calling `function` with the nodes `args`."""
+        args = tuple(args)
+        return self._add((function, args), function, args, None)
+
+    def run(self, results=None):
+        """Run every task the roots depend on, each node once.
+
+        Parameters
+        ----------
+        results : dict
+            mapping of nodes to their value, filled while running. Nodes
+            already in it are not run again, so passing the same dict to
+            several runs reuses the results.(Default None)
+
+        Returns
+        -------
+        result : tuple
+            the values of the roots, as parse would return them.
+
+        Raises
+        ------
+        ValueError
+            if a task returns a value which is not a valid data, in which
+            case the text has to be parsed without deferring.
+        """
+        if results is None:
+            results = {}
+        for node in self._get_needed():
+            if node in results:
+                continue
+            if node.is_leaf:
+                results[node] = node.value
+                continue
+            value = node.function(*[results[arg] for arg in node.args])
+            if self._is_token_data_callback(value) is not True:
+                raise ValueError("{0} returned {1!r} which is not a valid "
+                                 "data".format(node.function.__name__, value))
+            results[node] = value
+        return tuple(results[root] for root in self.roots)
+
+    def _get_needed(self):
+        # the nodes reachable from the roots, in the order of self.nodes
+        needed = set(self.roots)
+        for node in reversed(self.nodes):
+            if node in needed:
+                needed.update(node.args)
+        return [node for node in self.nodes if node in needed]
+
+
+def parse_deferred(bot, text):
+    """Parse the string `text` using `bot` without running any task.
+
+    The tasks are resolved as in a regular parse, assuming every task
+    returns a valid data, and the calls are recorded into an
+    ExpressionGraph. The plan cache and the trace of `bot` are not used.
+    """
+    session = bot._new_session(text)
+    metrics = session.metrics
+    try:
+        modifier_index_list = bot._tokenize(session)[0]
+        if metrics is not None:
+            metrics.lap(PHASE_TOKENIZE)
+        bot._apply_modifiers(session, modifier_index_list)
+        if metrics is not None:
+            metrics.lap(PHASE_MODIFIERS)
+        graph = ExpressionGraph(bot._is_token_data_callback)
+        buckets = bot._get_buckets(session)
+        for node in session.nodes:
+            if node.kind is KIND_DATA:
+                node.item = graph.leaf(node.item)
+        for priority in bot._priorities:
+            for node in buckets.get(priority, ()):
+                for task_node, data_nodes in bot._resolve(session, node):
+                    task_context, args = bot._take_task(session, task_node,
+                                                        data_nodes)
+                    task_node.set_result(graph.call(task_context.function,
+                                                    args))
+        graph.roots = session.result = bot._get_result(session)
+        if metrics is not None:
+            metrics.lap(PHASE_EVALUATE)
+    finally:
+        bot._end_session(session)
+    return graph
@@ -0,0 +1,171 @@
+KIND_DATA = 'data'
+KIND_TASK = 'task'
+
+
+class Node(object):
+    """A single field of the parsed list.
+
+    The kind of the field, either KIND_DATA or KIND_TASK, is decided once
+    when the node is created and updated when a task is replaced by its
+    result, so the data callback never has to be run on the parsed list.
+
+    Nodes are linked to their neighbours in both directions, so a field can
+    be removed or replaced in constant time. A node which has been removed
+    from its list has both of its links set to None.
+    """
+    __slots__ = ('item', 'kind', 'prev', 'next')
+
+    def __init__(self, item, kind=KIND_DATA, prev=None, next=None):
+        self.item = item
+        self.kind = kind
+        self.prev = prev
+        self.next = next
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r})'.format(type(self).__name__, self.item,
+                                          self.kind)
+
+
+class TaskNode(Node):
+    """A task field of the parsed list.
+
+    `item` is the TaskDef of the keyword, which is shared by every field
+    of the same keyword and never changed. A modifier changing the rule or
+    the context of the field creates an override holding them, so only the
+    fields which are modified allocate anything beyond the node itself.
+    """
+    __slots__ = ('override',)
+
+    def __init__(self, definition):
+        self.item = definition
+        self.kind = KIND_TASK
+        self.prev = self.next = self.override = None
+
+    def _get_override(self):
+        if self.override is None:
+            self.override = TaskOverride(self.item.rule, self.item.context)
+        return self.override
+
+    @property
+    def keyword(self):
+        """The keyword of the task."""
+        return self.item.keyword
+
+    @property
+    def rule(self):
+        """The rule of the task, including changes made by modifiers."""
+        if self.override is None:
+            return self.item.rule
+        return self.override.rule
+
+    @rule.setter
+    def rule(self, rule):
+        self._get_override().rule = rule
+
+    @property
+    def context(self):
+        """The context of the task, including changes made by modifiers."""
+        if self.override is None:
+            return self.item.context
+        return self.override.context
+
+    @context.setter
+    def context(self, context):
+        self._get_override().context = context
+
+    def set_result(self, result):
+        """Replace the task by its `result`, turning the node into data."""
+        self.item = result
+        self.kind = KIND_DATA
+        self.override = None
+
+
+class TaskOverride(object):
+    """Rule and context of a single task field changed by a modifier."""
+    __slots__ = ('rule', 'context')
+
+    def __init__(self, rule, context):
+        self.rule = rule
+        self.context = context
+
+
+class NodeList(object):
+    """Doubly linked list of Nodes used while evaluating the tasks.
+
+    The list uses two sentinel nodes, so every linked node has a `prev`
+    and a `next` node. Relative positions are resolved by walking the
+    links, which takes time proportional to the offset and not to the
+    length of the list.
+
+    Parameters
+    ----------
+    nodes : iterable of Node
+        unlinked nodes making up the initial list.
+    """
+    __slots__ = ('_head', '_tail', '_size')
+
+    def __init__(self, nodes=()):
+        self._head = Node(None)
+        self._tail = Node(None)
+        self._head.next = self._tail
+        self._tail.prev = self._head
+        self._size = 0
+        for node in nodes:
+            self.link(node)
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        node = self._head.next
+        while node is not self._tail:
+            yield node
+            node = node.next
+
+    def items(self):
+        """Return a list of the fields stored in the list."""
+        return [node.item for node in self]
+
+    def link(self, node):
+        """Add the unlinked `node` to the end of the list."""
+        last = self._tail.prev
+        node.prev = last
+        node.next = self._tail
+        last.next = node
+        self._tail.prev = node
+        self._size += 1
+
+    def append(self, item, kind=KIND_DATA):
+        """Add `item` to the end of the list and return its node."""
+        node = Node(item, kind)
+        self.link(node)
+        return node
+
+    def remove(self, node):
+        """Unlink `node` from the list."""
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = node.next = None
+        self._size -= 1
+
+    def walk(self, node, offset):
+        """Return the node `offset` positions away from `node`.
+
+        None is returned if the position lies outside the list.
+        """
+        if offset > 0:
+            while offset and node is not self._tail:
+                node = node.next
+                offset -= 1
+        else:
+            while offset and node is not self._head:
+                node = node.prev
+                offset += 1
+        if node is self._head or node is self._tail:
+            return None
+        return node
+
+
+def is_linked(node):
+    """Return whether `node` is still part of a NodeList."""
+    return node.next is not None
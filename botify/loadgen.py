@@ -0,0 +1,149 @@
+"""Load generator for :mod:`botify.server`.
+
+Opens several connections to a parse server, each keeping up to
+`pipeline` requests in flight, and reports the throughput and the
+latency percentiles as JSON::
+
+    python -m botify.loadgen --port 8765 --connections 8 --requests 20000
+
+Texts are read from a file, one per line, or default to a few calculator
+commands.
+"""
+import argparse
+import asyncio
+import collections
+import json
+import math
+import time
+
+from .aio import _run_until_complete
+
+DEFAULT_TEXTS = (
+    "what is 2 plus 3",
+    "2 plus 3 times 4",
+    "2 times 3 plus 4 times 5",
+    "1 plus 2 plus 3 plus 4",
+    "7",
+)
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of a sorted list."""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values)))
+    return sorted_values[max(rank - 1, 0)]
+
+
+async def _run_connection(host, port, texts, requests, pipeline, latencies,
+                          errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    slots = asyncio.Semaphore(pipeline)
+    sent = collections.deque()
+
+    async def send():
+        for i in range(requests):
+            await slots.acquire()
+            line = json.dumps({'id': i, 'text': texts[i % len(texts)]})
+            sent.append(_timer())
+            writer.write((line + '\n').encode('utf-8'))
+            await writer.drain()
+
+    sending = asyncio.ensure_future(send())
+    try:
+        for _ in range(requests):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("the server closed the connection")
+            latencies.append(_timer() - sent.popleft())
+            if 'error' in json.loads(line.decode('utf-8')):
+                errors[0] += 1
+            slots.release()
+        await sending
+    finally:
+        sending.cancel()
+        writer.close()
+
+
+async def run_load(host, port, texts=DEFAULT_TEXTS, connections=8,
+                   requests=10000, pipeline=16):
+    """Send `requests` parse requests to the server at `host`:`port`.
+
+    Parameters
+    ----------
+    texts : sequence of str
+        texts sent in turn by every connection.
+    connections : int
+        number of concurrent connections.(Default 8)
+    requests : int
+        total number of requests, split between the connections.
+        (Default 10000)
+    pipeline : int
+        maximum number of requests in flight on a connection.(Default 16)
+
+    Returns
+    -------
+    results : dict
+        number of `requests` and `errors`, `seconds` taken, `throughput`
+        in requests per second and `latency_us` percentiles.
+    """
+    latencies = []
+    errors = [0]
+    counts = [requests // connections + (i < requests % connections)
+              for i in range(connections)]
+    start = _timer()
+    await asyncio.gather(*[_run_connection(host, port, list(texts), count,
+                                           pipeline, latencies, errors)
+                           for count in counts if count])
+    seconds = _timer() - start
+    latencies.sort()
+    latency_us = {}
+    if latencies:
+        for name, percent in (('p50', 50), ('p90', 90), ('p99', 99),
+                              ('max', 100)):
+            latency_us[name] = percentile(latencies, percent) * 1e6
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'seconds': seconds,
+        'throughput': len(latencies) / seconds if seconds else None,
+        'latency_us': latency_us,
+    }
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Measure the throughput and latency of a parse server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--pipeline', type=int, default=16,
+                        help='requests in flight on each connection')
+    parser.add_argument('--texts', help='file holding one text per line')
+    parser.add_argument('-o', '--output',
+                        help='write the JSON results to this file')
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    texts = DEFAULT_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.rstrip('\n') for line in f if line.strip()]
+    results = _run_until_complete(run_load(args.host, args.port, texts,
+                                           args.connections, args.requests,
+                                           args.pipeline))
+    data = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(data + '\n')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+import threading
+import time
+
+PHASE_TOKENIZE = 'tokenize'
+PHASE_MODIFIERS = 'modifiers'
+PHASE_EVALUATE = 'evaluate'
+PHASE_TASKS = 'tasks'
+PHASE_PLAN = 'plan'
+
+PHASES = (PHASE_TOKENIZE, PHASE_MODIFIERS, PHASE_EVALUATE, PHASE_TASKS,
+          PHASE_PLAN)
+
+COUNTERS = ('callback_calls', 'resolver_steps', 'nonstrict_fallbacks',
+            'task_calls')
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+class ParseSample(object):
+    """Metrics of a single parse.
+
+    Attributes
+    ----------
+    parse_id : int
+        Number identifying the parse.
+    phase_times : dict
+        wall time in seconds spent in each phase. The `evaluate` phase
+        includes the time spent in the task functions, which is also given
+        on its own as the `tasks` phase. `plan` is the time spent running a
+        cached plan.
+    callback_calls : int
+        number of calls to `is_token_data_callback` and
+        `clean_data_callback`.
+    resolver_steps : int
+        number of rule offsets looked at while resolving tasks.
+    nonstrict_fallbacks : int
+        number of tasks which had to fall back to their non-strict rule.
+    task_calls : int
+        number of task functions called.
+    failed : bool
+        whether the parse raised an exception.
+    """
+    __slots__ = ('parse_id', 'phase_times', 'callback_calls',
+                 'resolver_steps', 'nonstrict_fallbacks', 'task_calls',
+                 'failed', '_last')
+
+    def __init__(self, parse_id):
+        self.parse_id = parse_id
+        self.phase_times = {}
+        self.callback_calls = 0
+        self.resolver_steps = 0
+        self.nonstrict_fallbacks = 0
+        self.task_calls = 0
+        self.failed = False
+        self._last = _timer()
+
+    def lap(self, phase):
+        """Add the time elapsed since the previous lap to `phase`."""
+        now = _timer()
+        self.phase_times[phase] = (self.phase_times.get(phase, 0.0)
+                                   + now - self._last)
+        self._last = now
+
+    def add_time(self, phase, seconds):
+        """Add `seconds` to the time spent in `phase`."""
+        self.phase_times[phase] = self.phase_times.get(phase, 0.0) + seconds
+
+
+class MetricsHook(object):
+    """Interface of the objects receiving the metrics of every parse.
+
+    Subclasses should override :meth:`on_parse`, which is called from the
+    thread which made the parse, right after it ends. It should be cheap,
+    e.g. put the sample on a queue read by the exporting thread.
+    """
+    def on_parse(self, sample):
+        """Receive the ParseSample of a parse which just ended."""
+        pass
+
+
+class ParseMetrics(object):
+    """Thread safe totals of the metrics of all the parses made.
+
+    Parameters
+    ----------
+    hooks : iterable of MetricsHook
+        objects receiving the ParseSample of every parse.
+    """
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getstate__(self):
+        # a copy sent to a worker process starts out empty and without
+        # hooks, the samples of its parses are sent back by parse_many
+        return {}
+
+    def __setstate__(self, state):
+        self.__init__()
+
+    def reset(self):
+        """Set all the totals back to 0."""
+        with self._lock:
+            self._parses = 0
+            self._failures = 0
+            self._phase_times = dict.fromkeys(PHASES, 0.0)
+            self._counters = dict.fromkeys(COUNTERS, 0)
+
+    def new_sample(self, parse_id):
+        """Return a ParseSample to collect the metrics of a parse."""
+        return ParseSample(parse_id)
+
+    def add_sample(self, sample):
+        """Add `sample` to the totals and pass it to the hooks."""
+        with self._lock:
+            self._parses += 1
+            if sample.failed:
+                self._failures += 1
+            for phase, seconds in sample.phase_times.items():
+                self._phase_times[phase] += seconds
+            for counter in COUNTERS:
+                self._counters[counter] += getattr(sample, counter)
+        for hook in self.hooks:
+            hook.on_parse(sample)
+
+    def snapshot(self):
+        """Return the totals as a dict.
+
+        Returns
+        -------
+        totals : dict
+            the number of `parses` and `failures`, the total `phase_times`
+            in seconds, and one key for every counter of ParseSample.
+        """
+        with self._lock:
+            totals = {'parses': self._parses,
+                      'failures': self._failures,
+                      'phase_times': dict(self._phase_times)}
+            totals.update(self._counters)
+        return totals
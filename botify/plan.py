@@ -0,0 +1,69 @@
+from collections import namedtuple
+
+
+class Plan(namedtuple('Plan', ('data_slots', 'steps', 'result_slots'))):
+    """The resolved order of task calls for a shape of input.
+
+    Data values are referred to by slots. The first slots hold the data
+    tokens which survived the modifiers, `data_slots` giving the position of
+    each of them among all the data tokens of the input. The result of every
+    step which is a valid data gets the next free slot.
+    """
+    __slots__ = ()
+
+
+class PlanStep(namedtuple('PlanStep', ('function', 'args', 'result_is_data',
+                                       'pure'))):
+    """A single task call of a Plan.
+
+    `args` holds the slots passed to `function` and `result_is_data` tells
+    whether the result was a valid data when the plan was recorded. `pure` is
+    taken from the Context of the task.
+    """
+    __slots__ = ()
+
+
+class PlanRecorder(object):
+    """Record the task calls made while parsing into a Plan.
+
+    Parameters
+    ----------
+    positions : dict
+        mapping of the data nodes created for the data tokens to their
+        position among the data tokens.
+    """
+    __slots__ = ('positions', 'data_slots', 'node_slots', 'steps',
+                 'slot_count')
+
+    def __init__(self, positions):
+        self.positions = positions
+        self.data_slots = None
+        self.node_slots = {}
+        self.steps = []
+        self.slot_count = 0
+
+    def bind(self, nodes):
+        """Assign the initial slots to the data nodes left in `nodes`."""
+        data_slots = []
+        for node in nodes:
+            if node in self.positions:
+                self.node_slots[node] = len(data_slots)
+                data_slots.append(self.positions[node])
+        self.data_slots = tuple(data_slots)
+        self.slot_count = len(data_slots)
+
+    def record(self, node, data_nodes, function, result_is_data, pure=False):
+        """Record a call of `function` with the data held by `data_nodes`.
+
+        If the result is a valid data it replaces the task held by `node`.
+        """
+        args = tuple(self.node_slots[data_node] for data_node in data_nodes)
+        self.steps.append(PlanStep(function, args, result_is_data, pure))
+        if result_is_data:
+            self.node_slots[node] = self.slot_count
+            self.slot_count += 1
+
+    def get_plan(self, nodes):
+        """Return the recorded Plan, `nodes` holding the left over data."""
+        return Plan(self.data_slots, tuple(self.steps),
+                    tuple(self.node_slots[node] for node in nodes))
@@ -0,0 +1,308 @@
+"""A local TCP server parsing texts with a pool of threads or processes.
+
+The protocol is one JSON object per line. A request holds the `text` to
+parse and an optional `id`, which is sent back with the response::
+
+    {"id": 1, "text": "2 plus 3"}
+    {"id": 1, "result": [5.0]}
+
+    {"id": 2, "text": "plus"}
+    {"id": 2, "error": "Unable to Parse. Try a different Input",
+     "type": "ValueError"}
+
+Responses are sent in the order of the requests of each connection, so a
+client may send many requests before reading the responses.
+
+Run a server holding the grammar of a snapshot file with::
+
+    python -m botify.server --snapshot grammar.json --port 8765
+
+and measure it using :mod:`botify.loadgen`. Both modules need Python 3.5
+or later.
+"""
+import argparse
+import asyncio
+import functools
+import json
+
+from .aio import _run_until_complete
+from .batch import (EXECUTOR_PROCESS, EXECUTOR_THREAD, ParseOutcome,
+                    _get_cpu_count, _merge_chunk, _new_process_pool,
+                    _parse_chunk)
+from .botify import Botify
+
+try:
+    _current_task = asyncio.current_task
+except AttributeError:
+    # before Python 3.7
+    _current_task = asyncio.Task.current_task
+
+
+def encode_outcome(request_id, outcome):
+    """Return the response line for the ParseOutcome of a request."""
+    if outcome.error is None:
+        response = {'id': request_id, 'result': list(outcome.result)}
+    else:
+        response = {'id': request_id, 'error': str(outcome.error),
+                    'type': type(outcome.error).__name__}
+    return (json.dumps(response, default=repr) + '\n').encode('utf-8')
+
+
+class ParseServer(object):
+    """Serve parse requests for a single grammar over TCP.
+
+    Requests of all the connections go through a single queue of at most
+    `max_pending` requests. When it is full, connections are not read any
+    further until there is room, so clients sending faster than the
+    workers can parse are slowed down by TCP flow control. Queued requests
+    are sent to the workers in batches of up to `batch_size`, at most one
+    batch per worker at a time, so batches grow with the load.
+
+    Parameters
+    ----------
+    bot : Botify or CompiledBot
+        the grammar used to parse the texts.
+    host : str
+        address to listen on.(Default '127.0.0.1')
+    port : int
+        port to listen on, 0 picks a free port.(Default 0)
+    executor : str
+        'thread' or 'process'.(Default 'thread')
+    max_workers : int
+        number of threads or processes. Defaults to the number of CPUs.
+    max_pending : int
+        maximum number of requests waiting for a worker.(Default 1024)
+    batch_size : int
+        maximum number of texts sent to a worker at once.(Default 32)
+    """
+    def __init__(self, bot, host='127.0.0.1', port=0,
+                 executor=EXECUTOR_THREAD, max_workers=None,
+                 max_pending=1024, batch_size=32):
+        if isinstance(bot, Botify):
+            bot = bot.compile()
+        if executor not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+            raise ValueError("Unknown executor {0!r}".format(executor))
+        if max_pending <= 0:
+            raise ValueError("max_pending must be a positive integer")
+        if batch_size <= 0:
+            raise ValueError("batch_size must be a positive integer")
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.executor = executor
+        self.max_workers = max_workers or _get_cpu_count()
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.requests = 0
+        self.batches = 0
+        self._pool = None
+        self._parse_chunk = None
+        self._server = None
+        self._queue = None
+        self._slots = None
+        self._batcher = None
+        self._running = set()
+        self._connections = set()
+
+    @property
+    def address(self):
+        """The ``(host, port)`` the server listens on, once started."""
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def start(self):
+        """Start the workers and listen for connections."""
+        from concurrent import futures
+        if self.executor == EXECUTOR_THREAD:
+            self._pool = futures.ThreadPoolExecutor(self.max_workers)
+            self._parse_chunk = functools.partial(_parse_chunk, self.bot)
+        else:
+            self._pool, self._parse_chunk = _new_process_pool(
+                futures, self.max_workers, self.bot)
+        self._queue = asyncio.Queue(self.max_pending)
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._batcher = asyncio.ensure_future(self._run_batches())
+        self._server = await asyncio.start_server(self._handle, self.host,
+                                                  self.port)
+
+    async def serve_forever(self):
+        """Start the server if needed and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        try:
+            if hasattr(self._server, 'serve_forever'):
+                await self._server.serve_forever()
+            else:
+                # before Python 3.7, wait until cancelled
+                await asyncio.get_event_loop().create_future()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """Stop listening, and stop the workers once they are done."""
+        if self._server is not None:
+            self._server.close()
+        # since Python 3.12, wait_closed also waits for the connections
+        for task in self._connections:
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        if self._server is not None:
+            await self._server.wait_closed()
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def stats(self):
+        """Return the number of requests and batches handled so far."""
+        return {'requests': self.requests, 'batches': self.batches,
+                'pending': self._queue.qsize() if self._queue else 0}
+
+    async def _handle(self, reader, writer):
+        loop = asyncio.get_event_loop()
+        responses = asyncio.Queue(self.max_pending)
+        writing = asyncio.ensure_future(self._write_responses(writer,
+                                                              responses))
+        task = _current_task()
+        self._connections.add(task)
+        try:
+            skipping = False
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as e:
+                    # the last line has no end of line
+                    line = e.partial
+                except asyncio.LimitOverrunError as e:
+                    # longer than the limit of the reader, the line is
+                    # dropped up to its end
+                    await reader.readexactly(e.consumed)
+                    if not skipping:
+                        skipping = True
+                        await self._reject(responses, "line too long")
+                    continue
+                if skipping:
+                    skipping = False
+                    continue
+                if not line:
+                    break
+                try:
+                    request = json.loads(line.decode('utf-8'))
+                    request_id = request.get('id')
+                    text = request['text']
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    await self._reject(responses, e)
+                    continue
+                future = loop.create_future()
+                await responses.put((request_id, future))
+                await self._queue.put((text, future))
+            await responses.put(None)
+            await writing
+        except (ConnectionError, asyncio.CancelledError):
+            # the task is only cancelled by close, and the stream protocol
+            # logs the handlers which end cancelled
+            pass
+        finally:
+            writing.cancel()
+            try:
+                await writing
+            except asyncio.CancelledError:
+                pass
+            writer.close()
+            self._connections.discard(task)
+
+    async def _reject(self, responses, error):
+        future = asyncio.get_event_loop().create_future()
+        future.set_result(ParseOutcome(
+            None, ValueError("Bad request: {0}".format(error))))
+        await responses.put((None, future))
+
+    async def _write_responses(self, writer, responses):
+        while True:
+            item = await responses.get()
+            if item is None:
+                break
+            request_id, future = item
+            outcome = await future
+            writer.write(encode_outcome(request_id, outcome))
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _run_batches(self):
+        while True:
+            batch = [await self._queue.get()]
+            await self._slots.acquire()
+            # everything queued while waiting for a worker joins the batch
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_event_loop()
+        texts = [text for text, _ in batch]
+        self.requests += len(batch)
+        self.batches += 1
+        try:
+            function = functools.partial(self._parse_chunk, texts)
+            outcomes = await loop.run_in_executor(self._pool, function)
+            if self.executor == EXECUTOR_PROCESS:
+                outcomes = _merge_chunk(self.bot, outcomes)
+        except Exception as e:
+            outcomes = [ParseOutcome(None, e)] * len(batch)
+        finally:
+            self._slots.release()
+        for (_, future), outcome in zip(batch, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description='Serve parse requests for a grammar over TCP.')
+    grammar = parser.add_mutually_exclusive_group(required=True)
+    grammar.add_argument('--snapshot',
+                         help='snapshot file holding the grammar')
+    grammar.add_argument('--factory', metavar='MODULE:FUNCTION',
+                         help='function returning the Botify to serve')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--executor', default=EXECUTOR_THREAD,
+                        choices=(EXECUTOR_THREAD, EXECUTOR_PROCESS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-pending', type=int, default=1024)
+    parser.add_argument('--batch-size', type=int, default=32)
+    return parser
+
+
+def main(argv=None):
+    from .snapshot import import_path, load_snapshot
+
+    args = get_parser().parse_args(argv)
+    if args.snapshot:
+        bot = load_snapshot(args.snapshot)
+    else:
+        bot = import_path(args.factory)()
+    server = ParseServer(bot, args.host, args.port, args.executor,
+                         args.workers, args.max_pending, args.batch_size)
+
+    async def serve():
+        await server.start()
+        print('Serving on {0}:{1}'.format(*server.address))
+        await server.serve_forever()
+
+    try:
+        _run_until_complete(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
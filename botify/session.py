@@ -0,0 +1,62 @@
+class ParseSession(object):
+    """State of a single call to parse.
+
+    A new ParseSession is created for every parse, so that a single
+    Botify or CompiledBot object can be used from many threads at once.
+
+    Attributes
+    ----------
+    text : str
+        The string which is being parsed.
+    tokens : list of str
+        The tokens extracted from `text`.
+    parsed_list : list of Node
+        The data fields and task fields after applying modifiers.
+    nodes : NodeList
+        The linked list of fields which is reduced while evaluating the
+        tasks. None until evaluation starts.
+    parse_id : int
+        Number identifying the parse in the records of a TraceBuffer.
+    trace : list of TraceRecord
+        The task calls made, if the parse is traced, else None.
+    recorder : PlanRecorder
+        Records the task calls when the plan cache is enabled and the
+        input did not match a cached plan, else None.
+    metrics : ParseSample
+        The metrics of the parse, if metrics are enabled, else None.
+    budget : BudgetTracker
+        The work done by the parse, if it has a budget, else None.
+    result : tuple
+        A tuple of left over Data after processing. None until the parse
+        has completed successfully.
+    """
+    def __init__(self, text, parse_id=0, trace=False, metrics=None,
+                 budget=None):
+        self.text = text
+        self.parse_id = parse_id
+        self.tokens = []
+        self.parsed_list = []
+        self.nodes = None
+        self.trace = [] if trace else None
+        self.recorder = None
+        self.metrics = metrics
+        self.budget = budget
+        self.result = None
+
+    @property
+    def report(self):
+        """Information about every task which was run.
+
+        Each dict contains the `function` name, the `parameters` passed and
+        the `result` returned. The report is empty unless the parse was
+        traced.
+        """
+        if self.trace is None:
+            return []
+        return [{'function': record.function,
+                 'parameters': record.parameters,
+                 'result': record.result} for record in self.trace]
+
+    def __repr__(self):
+        return '{0}(text={1!r}, result={2!r})'.format(
+            type(self).__name__, self.text, self.result)
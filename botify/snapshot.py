@@ -0,0 +1,260 @@
+"""Saving the grammar of a Botify object to a file and loading it back."""
+import importlib
+import inspect
+import json
+
+from .botify import Botify, Context
+from .tokenizer import RegexTokenizer
+
+SNAPSHOT_FORMAT = 'botify-snapshot'
+SNAPSHOT_VERSION = 1
+
+
+class LazyFunction(object):
+    """A task function referenced by its import path.
+
+    The function is imported the first time it is called, so loading a
+    snapshot does not import the modules defining the tasks. Its number of
+    arguments is stored in the snapshot and exposed through the signature,
+    so compiling the grammar does not import them either.
+
+    Parameters
+    ----------
+    path : str
+        ``'module:qualified.name'`` of the function.
+    arity : int
+        number of arguments taken by the function.
+    """
+    def __init__(self, path, arity):
+        self.path = path
+        self.arity = arity
+        self.__name__ = path.rpartition(':')[2].rpartition('.')[2]
+        self._function = None
+
+    def __call__(self, *args):
+        function = self._function
+        if function is None:
+            function = self._function = import_path(self.path)
+        return function(*args)
+
+    @property
+    def __signature__(self):
+        kind = inspect.Parameter.POSITIONAL_OR_KEYWORD
+        return inspect.Signature([inspect.Parameter('arg{0}'.format(i), kind)
+                                  for i in range(self.arity)])
+
+    def __repr__(self):
+        return '{0}({1!r}, {2!r})'.format(type(self).__name__, self.path,
+                                          self.arity)
+
+
+def import_path(path):
+    """Return the object referenced by ``'module:qualified.name'``."""
+    module_name, _, qualname = path.partition(':')
+    obj = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+def get_path(function):
+    """Return the ``'module:qualified.name'`` import path of `function`.
+
+    Raises
+    ------
+    ValueError
+        if the function cannot be imported back from its path, like
+        lambdas and functions defined inside other functions.
+    """
+    if isinstance(function, LazyFunction):
+        return function.path
+    module_name = getattr(function, '__module__', None)
+    qualname = getattr(function, '__qualname__',
+                       getattr(function, '__name__', None))
+    if module_name is None or qualname is None:
+        raise ValueError("{0!r} cannot be referenced by an import "
+                         "path".format(function))
+    path = '{0}:{1}'.format(module_name, qualname)
+    try:
+        found = import_path(path)
+    except (ImportError, AttributeError):
+        found = None
+    if found is not function:
+        raise ValueError("{0!r} cannot be referenced by an import path, "
+                         "it is not reachable as {1}".format(function, path))
+    return path
+
+
+class _FunctionTable(object):
+    # Stores every distinct function once, tasks refer to its index.
+    def __init__(self):
+        self.entries = []
+        self._indices = {}
+
+    def add(self, function, arity):
+        path = get_path(function)
+        try:
+            return self._indices[path]
+        except KeyError:
+            index = self._indices[path] = len(self.entries)
+            self.entries.append([path, arity])
+            return index
+
+
+def dump_snapshot(bot):
+    """Return the grammar of `bot` as a dict which can be saved as JSON.
+
+    Parameters
+    ----------
+    bot : Botify
+        the bot to take a snapshot of.
+
+    Returns
+    -------
+    snapshot : dict
+        the tasks, modifiers, callbacks, tokenizer and options of `bot`,
+        functions being referenced by import path.
+
+    Raises
+    ------
+    ValueError
+        if a function or the tokenizer cannot be referenced by an import
+        path.
+    """
+    compiled = bot._get_compiled()
+    with bot._update_lock:
+        bot_tasks, bot_modifiers = dict(bot._tasks), dict(bot._modifiers)
+    functions = _FunctionTable()
+
+    def add_function(function):
+        return functions.add(function, compiled._get_arity(function))
+
+    tasks = []
+    for keyword, task in bot_tasks.items():
+        context = task['context']
+        tasks.append([keyword, add_function(context.function),
+                      context.priority, list(task['rule']), context.pure])
+
+    modifiers = []
+    for modifier, modifier_dict in bot_modifiers.items():
+        for keyword, values in modifier_dict.items():
+            for action, parameter, relative_pos in values:
+                if action == Botify.ACTION_UPDATE_CONTEXT:
+                    parameter = [add_function(parameter.function),
+                                 parameter.priority, parameter.pure]
+                elif action == Botify.ACTION_UPDATE_RULE:
+                    parameter = list(parameter)
+                modifiers.append([modifier, keyword, relative_pos, action,
+                                  parameter])
+
+    tokenizer = bot._tokenizer
+    if isinstance(tokenizer, RegexTokenizer):
+        tokenizer = {'pattern': tokenizer.pattern}
+    else:
+        tokenizer = {'path': get_path(tokenizer)}
+
+    return {
+        'format': SNAPSHOT_FORMAT,
+        'version': SNAPSHOT_VERSION,
+        'options': {'strict_mode_enabled': bot.strict_mode_enabled,
+                    'plan_cache_size': bot._plan_cache_size,
+                    'token_cache_size': bot._token_cache_size,
+                    'result_cache_size': bot._result_cache_size,
+                    'result_cache_ttl': bot._result_cache_ttl,
+                    'typo_max_distance': bot._typo_max_distance,
+                    'typo_min_length': bot._typo_min_length},
+        'callbacks': [get_path(bot._is_token_data_callback),
+                      get_path(bot._clean_data_callback)],
+        'tokenizer': tokenizer,
+        'functions': functions.entries,
+        'tasks': tasks,
+        'modifiers': modifiers,
+    }
+
+
+def restore_snapshot(snapshot, lazy=True):
+    """Create a compiled Botify object from a dict made by dump_snapshot.
+
+    Parameters
+    ----------
+    snapshot : dict
+        the snapshot to restore.
+    lazy : bool
+        whether task functions are imported the first time they are
+        called instead of right away.(Default True)
+
+    Returns
+    -------
+    bot : Botify
+        a bot holding the grammar of the snapshot, already compiled.
+
+    Raises
+    ------
+    ValueError
+        if `snapshot` is not a snapshot of a supported version.
+    """
+    if (not isinstance(snapshot, dict)
+            or snapshot.get('format') != SNAPSHOT_FORMAT):
+        raise ValueError("Not a botify snapshot")
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        raise ValueError("Unsupported snapshot version {0!r}".format(
+            snapshot.get('version')))
+
+    if lazy:
+        functions = [LazyFunction(path, arity)
+                     for path, arity in snapshot['functions']]
+    else:
+        functions = [import_path(path) for path, _ in snapshot['functions']]
+
+    tokenizer = snapshot['tokenizer']
+    if 'pattern' in tokenizer:
+        tokenizer = RegexTokenizer(tokenizer['pattern'])
+    else:
+        tokenizer = import_path(tokenizer['path'])
+
+    is_token_data_callback, clean_data_callback = [
+        import_path(path) for path in snapshot['callbacks']]
+    bot = Botify(is_token_data_callback, clean_data_callback, tokenizer)
+
+    with bot.bulk_update():
+        for keyword, function_index, priority, rule, pure in (
+                snapshot['tasks']):
+            bot.add_task((keyword,),
+                         Context(functions[function_index], priority, pure),
+                         tuple(rule))
+        for modifier, keyword, relative_pos, action, parameter in (
+                snapshot['modifiers']):
+            if action == Botify.ACTION_UPDATE_CONTEXT:
+                parameter = Context(functions[parameter[0]], parameter[1],
+                                    parameter[2])
+            elif action == Botify.ACTION_UPDATE_RULE:
+                parameter = tuple(parameter)
+            bot.add_modifier(modifier, (keyword,), relative_pos, action,
+                             parameter)
+
+    options = snapshot['options']
+    bot.strict_mode_enabled = options['strict_mode_enabled']
+    if options['plan_cache_size']:
+        bot.enable_plan_cache(options['plan_cache_size'])
+    if options['token_cache_size']:
+        bot.enable_token_cache(options['token_cache_size'])
+    if options['result_cache_size']:
+        bot.enable_result_cache(options['result_cache_size'],
+                                options['result_cache_ttl'])
+    if options['typo_max_distance']:
+        bot.enable_typo_tolerance(options['typo_max_distance'],
+                                  options['typo_min_length'])
+    bot._get_compiled()
+    return bot
+
+
+def save_snapshot(bot, path):
+    """Write the snapshot of `bot` to the file at `path` as JSON."""
+    with open(path, 'w') as f:
+        json.dump(dump_snapshot(bot), f, separators=(',', ':'))
+
+
+def load_snapshot(path, lazy=True):
+    """Read the snapshot file at `path` and return a compiled Botify."""
+    with open(path) as f:
+        return restore_snapshot(json.load(f), lazy)
@@ -0,0 +1,295 @@
+"""Parsing a text given as a stream of chunks, yielding results early."""
+import collections
+
+from .engine import KIND_DATA, KIND_TASK, Node, NodeList, TaskNode
+
+DEFAULT_WINDOW = 32
+
+# text is tokenized in pieces of at least this many characters, so streams
+# of short chunks like single words are not parsed one chunk at a time
+_MIN_PIECE = 64
+
+
+class StreamWindowError(ValueError):
+    """Raised when a task of a streamed text reaches too far.
+
+    The fields a task may use while being resolved must lie within
+    `window` fields of it in the text. Beyond that, the fields may already
+    have been yielded or not be read yet, and the result could differ from
+    the one of a regular parse.
+
+    Attributes
+    ----------
+    window : int
+        the window of the parse.
+    """
+    def __init__(self, window):
+        ValueError.__init__(self, "Unable to Parse. A task reaches further "
+                                  "than the stream window of {0} "
+                                  "fields".format(window))
+        self.window = window
+
+    def __reduce__(self):
+        return type(self), (self.window,)
+
+
+class _WindowNodeList(NodeList):
+    # A NodeList checking that every node reached while resolving a task
+    # lies within the window of the task which is being resolved.
+    __slots__ = ('positions', 'root_position', 'window', 'open_left',
+                 'open_right')
+
+    def __init__(self, window):
+        NodeList.__init__(self)
+        self.positions = {}
+        self.root_position = 0
+        self.window = window
+        # whether nodes have been yielded before the first one, or may
+        # still be added after the last one
+        self.open_left = False
+        self.open_right = True
+
+    def remove(self, node):
+        NodeList.remove(self, node)
+        del self.positions[node]
+
+    def walk(self, node, offset):
+        found = NodeList.walk(self, node, offset)
+        if found is None:
+            if self.open_right if offset > 0 else self.open_left:
+                raise StreamWindowError(self.window)
+        elif (abs(self.positions[found] - self.root_position)
+                > self.window):
+            raise StreamWindowError(self.window)
+        return found
+
+    def first(self):
+        node = self._head.next
+        if node is self._tail:
+            return None
+        return node
+
+
+def _get_modifier_reach(bot):
+    # Return how many fields before and after a modifier its actions may
+    # change, as offsets from the index recorded for it while tokenizing.
+    left = right = 0
+    for (_, relative_pos, _), actions in bot._modifier_actions.items():
+        target = relative_pos - 1 if relative_pos > 0 else relative_pos
+        reached = [target]
+        for action, parameter in actions:
+            if action == type(bot)._action_delete:
+                reached.append(target + parameter)
+        left = max(left, -min(reached))
+        right = max(right, max(reached))
+    return left, right
+
+
+class _StreamParser(object):
+    """State of a streamed parse.
+
+    Text is split into tokens up to its last whitespace. Tokens become
+    fields once every phrase they may start is complete, and fields are
+    first kept in a staging list, where modifiers are applied as in a
+    regular parse. A field no modifier can change any more is moved to
+    the NodeList in which tasks are resolved.
+
+    The tasks of each priority are resolved in the order of the text, like
+    in a regular parse. A task is resolved once the fields up to `window`
+    after it have been read, and every task of a higher priority which may
+    change the fields it uses has been resolved. A data at the start of the
+    list is yielded once no task left to resolve can use it.
+    """
+    def __init__(self, bot, session, separator, window):
+        self.bot = bot
+        self.session = session
+        self.separator = separator
+        self.window = window
+        self.text = None
+        self.tokens = []
+        self.spans = []
+        self.token_count = 0
+        self.staged = []
+        self.field_count = 0
+        self.committed = 0
+        self.last_position = -1
+        self.modifiers = collections.deque()
+        self.modifier_reach = _get_modifier_reach(bot)
+        self.nodes = session.nodes = _WindowNodeList(window)
+        self.levels = dict((priority, level) for level, priority
+                           in enumerate(bot._priorities))
+        self.roots = [collections.deque() for _ in bot._priorities]
+        self.ended = False
+
+    def feed(self, chunk):
+        """Add `chunk` to the text and return the data which are final."""
+        if self.text is None:
+            text = chunk
+        else:
+            text = self.text + self.separator + chunk
+        if len(text) < _MIN_PIECE:
+            self.text = text
+            return []
+        end = len(text)
+        while end and not text[end - 1].isspace():
+            end -= 1
+        self.text = text[end:]
+        if end:
+            self._add_tokens(text[:end])
+        return self._run()
+
+    def end(self):
+        """Parse the rest of the text and return the last data."""
+        if self.text:
+            self._add_tokens(self.text)
+        self.text = None
+        self.ended = True
+        self.nodes.open_right = False
+        results = self._run()
+        if self.nodes.first() is not None:
+            raise ValueError("Unable to Parse")
+        return results
+
+    def _add_tokens(self, text):
+        spans = self.bot._split_text(self.session, text, self.token_count)
+        self.token_count += len(spans)
+        self.tokens.extend(self.session.tokens)
+        self.spans.extend(spans)
+
+    def _read_tokens(self):
+        # Turn the tokens into fields, keeping enough tokens to recognize
+        # the phrases which may continue in the text not read yet.
+        bot = self.bot
+        tokens, spans = self.tokens, self.spans
+        if self.ended:
+            limit = len(tokens)
+        else:
+            limit = len(tokens) - bot._phrases.max_words + 1
+        i = 0
+        for i, item, is_data, data in bot._read_fields(tokens, spans, limit,
+                                                       self.session.metrics):
+            if is_data:
+                self._stage(Node(data, KIND_DATA))
+
+            if item in bot._tasks:
+                self._stage(TaskNode(bot._tasks[item]))
+
+            if item in bot._modifiers:
+                self.modifiers.append((self.field_count, item))
+        del tokens[:i]
+        del spans[:i]
+
+    def _stage(self, node):
+        self.staged.append((self.field_count, node))
+        self.field_count += 1
+
+    def _apply_modifiers(self):
+        # A modifier is applied once the fields it may change have been
+        # read. Fields are moved out of the staging list once no modifier
+        # can change them.
+        bot = self.bot
+        session = self.session
+        left, right = self.modifier_reach
+        staged = self.staged
+        modifiers = self.modifiers
+        while modifiers:
+            pos, item = modifiers[0]
+            # the index of the modifier among the staged fields
+            index = pos - self.committed
+            if not self.ended and len(staged) <= index + right:
+                break
+            modifiers.popleft()
+            fields = session.parsed_list = [node for _, node in staged]
+            bot._apply_modifiers(session, [(index, item)])
+            if len(fields) != len(staged):
+                kept = set(fields)
+                staged[:] = [entry for entry in staged if entry[1] in kept]
+        if modifiers:
+            limit = modifiers[0][0] - left
+        elif self.ended:
+            limit = None
+        else:
+            limit = self.field_count - left
+        count = 0
+        for position, node in staged:
+            if limit is not None and self.committed + count >= limit:
+                break
+            count += 1
+            self._commit(position, node)
+        del staged[:count]
+        self.committed += count
+
+    def _commit(self, position, node):
+        self.nodes.link(node)
+        self.nodes.positions[node] = position
+        self.last_position = position
+        if node.kind is KIND_TASK:
+            level = self.levels[node.context.priority]
+            self.roots[level].append((position, node))
+
+    def _is_done(self, level, position):
+        # whether the tasks of `level` up to `position` have been resolved
+        roots = self.roots[level]
+        if roots:
+            return roots[0][0] > position
+        return self.ended or self.last_position >= position
+
+    def _resolve_tasks(self):
+        bot = self.bot
+        session = self.session
+        nodes = self.nodes
+        window = self.window
+        for level, roots in enumerate(self.roots):
+            while roots:
+                position, node = roots[0]
+                if not self.ended and self.last_position <= position + window:
+                    break
+                if not all(self._is_done(higher, position + 2 * window)
+                           for higher in range(level)):
+                    break
+                roots.popleft()
+                nodes.root_position = position
+                bot._find_data(session, node)
+
+    def _pop_results(self):
+        nodes = self.nodes
+        results = []
+        node = nodes.first()
+        while node is not None and node.kind is KIND_DATA:
+            position = nodes.positions[node] + self.window
+            if not all(self._is_done(level, position)
+                       for level in range(len(self.roots))):
+                break
+            results.append(node.item)
+            nodes.remove(node)
+            nodes.open_left = True
+            node = nodes.first()
+        return results
+
+    def _run(self):
+        self._read_tokens()
+        self._apply_modifiers()
+        self._resolve_tasks()
+        return self._pop_results()
+
+
+def parse_stream(bot, chunks, separator='', window=DEFAULT_WINDOW):
+    """Parse the text made of `chunks` using `bot`, yielding the left over
+    data as soon as they are known.
+
+    See :meth:`Botify.parse_stream`.
+    """
+    if window <= 0:
+        raise ValueError("window must be a positive integer")
+    session = bot._new_session('')
+    parser = _StreamParser(bot, session, separator, window)
+    try:
+        for chunk in chunks:
+            for result in parser.feed(chunk):
+                yield result
+        for result in parser.end():
+            yield result
+        # the results have all been yielded, none are kept
+        session.result = ()
+    finally:
+        bot._end_session(session)
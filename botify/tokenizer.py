@@ -0,0 +1,155 @@
+import re
+
+TOKEN_WORD = 'word'
+TOKEN_DATA = 'data'
+
+_END = ''
+
+# A number is only signed where the sign cannot be a binary operator.
+_NUMBER = (r'(?<![\w.)])[-+]?(?:\d+\.\d+|\.\d+|\d+)(?:[eE][-+]?\d+)?'
+           r'(?!\w|\.\d)')
+_WORD = r"\w+(?:'\w+)*"
+_PUNCTUATION = r"[^\w\s]"
+
+
+class RegexTokenizer(object):
+    """Split a text into spans of tokens using a compiled regex.
+
+    By default numbers like `5`, `-2.5` or `1e3`, words and single
+    punctuation characters are separate tokens, so `(3+4),` yields the
+    tokens `(`, `3`, `+`, `4`, `)` and `,`.
+
+    Calling the tokenizer returns a list of ``(start, end, kind)`` tuples,
+    `kind` being TOKEN_DATA for tokens known to be data and TOKEN_WORD for
+    the others, whose kind is decided by `is_token_data_callback`.
+
+    Parameters
+    ----------
+    pattern : str
+        a regex matching a single token. Named groups called `data` mark
+        the tokens which are data. Defaults to the pattern described
+        above, use ``r'\\S+'`` to split the text on whitespace only.
+    numbers_are_data : bool
+        whether numbers matched by the default pattern are data without
+        running `is_token_data_callback`.(Default False)
+
+    Attributes
+    ----------
+    pattern : str
+        the regex used, including the default one.
+    """
+    def __init__(self, pattern=None, numbers_are_data=False):
+        if pattern is None:
+            number_group = 'data' if numbers_are_data else 'number'
+            pattern = '(?P<{0}>{1})|{2}|{3}'.format(number_group, _NUMBER,
+                                                   _WORD, _PUNCTUATION)
+        self.pattern = pattern
+        self._regex = re.compile(pattern, re.UNICODE)
+
+    def __call__(self, text):
+        data_kind = TOKEN_DATA
+        word_kind = TOKEN_WORD
+        return [(m.start(), m.end(),
+                 data_kind if m.lastgroup == 'data' else word_kind)
+                for m in self._regex.finditer(text)]
+
+
+def normalize_keyword(keyword, tokenizer):
+    """Return the tokens of `keyword` separated by single spaces."""
+    return ' '.join(keyword[start:end] for start, end, _ in tokenizer(keyword))
+
+
+class KeywordTrie(object):
+    """Word level trie holding the keywords made of more than one word.
+
+    Tasks and modifiers may be triggered by phrases like `square root` or
+    `divided by`. All such phrases are stored in a single trie, so they can
+    be recognized while walking over the tokens once, always preferring
+    the longest phrase starting at a token.
+
+    Parameters
+    ----------
+    keywords : iterable of str
+        keywords to add to the trie. Keywords made of a single word are
+        ignored since they are matched by a plain lookup.
+
+    Attributes
+    ----------
+    max_words : int
+        number of words of the longest keyword added, 1 if there is none.
+    """
+    def __init__(self, keywords=()):
+        self._root = {}
+        self.max_words = 1
+        for keyword in keywords:
+            self.add(keyword)
+
+    def __contains__(self, word):
+        return word in self._root
+
+    def __bool__(self):
+        return bool(self._root)
+
+    __nonzero__ = __bool__
+
+    def add(self, keyword):
+        """Add `keyword` to the trie if it is made of more than one word."""
+        words = keyword.split()
+        if len(words) < 2:
+            return
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        node[_END] = ' '.join(words)
+        self.max_words = max(self.max_words, len(words))
+
+    def extended(self, keywords):
+        """Return a new trie holding the keywords of this one and `keywords`.
+
+        Only the nodes on the paths of the added keywords are copied, the
+        rest is shared with this trie, which is left unchanged.
+        """
+        trie = KeywordTrie()
+        trie._root = root = dict(self._root)
+        trie.max_words = self.max_words
+        copied = set([id(root)])
+        for keyword in keywords:
+            words = keyword.split()
+            if len(words) < 2:
+                continue
+            node = root
+            for word in words:
+                child = node.get(word)
+                if child is None or id(child) not in copied:
+                    child = node[word] = dict(child or ())
+                    copied.add(id(child))
+                node = child
+            node[_END] = ' '.join(words)
+            trie.max_words = max(trie.max_words, len(words))
+        return trie
+
+    def match(self, tokens, start):
+        """Find the longest keyword starting at ``tokens[start]``.
+
+        Parameters
+        ----------
+        tokens : list of str
+            the tokens being parsed.
+        start : int
+            index of the first token of the keyword.
+
+        Returns
+        -------
+        end, keyword : int, str
+            index of the token following the keyword, and the keyword
+            found, or `start` and None if no keyword starts there.
+        """
+        end, keyword = start, None
+        node = self._root
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if _END in node:
+                end, keyword = i + 1, node[_END]
+        return end, keyword
@@ -0,0 +1,68 @@
+from collections import namedtuple
+import threading
+
+TRACE_OFF = 'off'
+TRACE_SAMPLED = 'sampled'
+TRACE_FULL = 'full'
+
+
+class TraceRecord(namedtuple('TraceRecord', ('parse_id', 'function',
+                                             'parameters', 'result'))):
+    """A single task call made while parsing.
+
+    `parse_id` identifies the parse the call was made in, `function` is the
+    name of the task function.
+    """
+    __slots__ = ()
+
+
+class TraceBuffer(object):
+    """Fixed size ring buffer of TraceRecords shared across parses.
+
+    Once full, the oldest records are overwritten, so the buffer always
+    holds the most recent task calls made by any parse.
+
+    Parameters
+    ----------
+    capacity : int
+        maximum number of records held.
+    """
+    def __init__(self, capacity=1024):
+        if capacity <= 0:
+            raise ValueError("capacity must be a positive integer")
+        self.capacity = capacity
+        self._records = [None] * capacity
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    def __getstate__(self):
+        # the records stay with the process holding the buffer, a copy
+        # sent to a worker process starts out empty
+        return {'capacity': self.capacity}
+
+    def __setstate__(self, state):
+        self.__init__(state['capacity'])
+
+    def extend(self, records):
+        """Add `records` to the buffer, overwriting the oldest ones."""
+        with self._lock:
+            for record in records:
+                self._records[self._count % self.capacity] = record
+                self._count += 1
+
+    def records(self):
+        """Return a list of the records held, from the oldest one."""
+        with self._lock:
+            if self._count <= self.capacity:
+                return self._records[:self._count]
+            start = self._count % self.capacity
+            return self._records[start:] + self._records[:start]
+
+    def clear(self):
+        """Remove all the records."""
+        with self._lock:
+            self._records = [None] * self.capacity
+            self._count = 0
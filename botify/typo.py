@@ -0,0 +1,116 @@
+def get_deletes(word, max_distance):
+    """Return the strings obtained by deleting up to `max_distance`
+    characters from `word`, including `word` itself."""
+    deletes = set([word])
+    frontier = deletes
+    for _ in range(max_distance):
+        frontier = set(w[:i] + w[i+1:] for w in frontier
+                       for i in range(len(w)))
+        deletes |= frontier
+    return deletes
+
+
+def edit_distance(a, b):
+    """Return the optimal string alignment distance between `a` and `b`.
+
+    It is the number of insertions, deletions, substitutions and swaps of
+    adjacent characters needed to turn `a` into `b`.
+    """
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+class TypoIndex(object):
+    """Symmetric delete index finding the words close to a misspelled one.
+
+    Every string obtained by deleting up to `max_distance` characters from
+    a word is mapped to that word when the word is added. A lookup deletes
+    characters from the token the same way and checks the words sharing
+    one of the resulting strings, so its cost depends on the length of the
+    token and not on the number of words.
+
+    Parameters
+    ----------
+    words : iterable of str
+        the correctly spelled words.
+    max_distance : int
+        maximum edit distance between a token and the word it is corrected
+        to.(Default 1)
+    min_length : int
+        tokens shorter than this are never corrected.(Default 4)
+    """
+    def __init__(self, words=(), max_distance=1, min_length=4):
+        if max_distance <= 0:
+            raise ValueError("max_distance must be a positive integer")
+        self.max_distance = max_distance
+        self.min_length = min_length
+        self._words = set()
+        self._deletes = {}
+        for word in words:
+            self.add(word)
+
+    def __contains__(self, word):
+        return word in self._words
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, word):
+        """Add the correctly spelled `word` to the index."""
+        if word in self._words:
+            return
+        self._words.add(word)
+        deletes = self._deletes
+        for delete in get_deletes(word, self.max_distance):
+            # tuples are never changed in place, so copies can share them
+            deletes[delete] = deletes.get(delete, ()) + (word,)
+
+    def copy(self):
+        """Return an index holding the same words, which can be added to
+        without changing this one."""
+        index = TypoIndex(max_distance=self.max_distance,
+                          min_length=self.min_length)
+        index._words = set(self._words)
+        index._deletes = dict(self._deletes)
+        return index
+
+    def lookup(self, token):
+        """Return the word `token` is a misspelling of.
+
+        Returns
+        -------
+        word : str
+            `token` itself if it is a word of the index, the closest word
+            within `max_distance` edits, or None if there is none or if
+            several words are equally close.
+        """
+        if token in self._words:
+            return token
+        if len(token) < self.min_length:
+            return None
+        best, best_distance, ambiguous = None, self.max_distance + 1, False
+        seen = set()
+        for delete in get_deletes(token, self.max_distance):
+            for word in self._deletes.get(delete, ()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = edit_distance(token, word)
+                if distance < best_distance:
+                    best, best_distance, ambiguous = word, distance, False
+                elif distance == best_distance:
+                    ambiguous = True
+        if ambiguous:
+            return None
+        return best
@@ -1,4 +1,7 @@
 import inspect
+import threading
+import time
+from collections import OrderedDict, namedtuple
 
 def _get_args_count_helper(function, argspec_func):
     args = argspec_func(function).args
@@ -16,5 +19,122 @@ def get_args_count(function):
         try:
             return _get_args_count_helper(function, inspect.getfullargspec)
         except AttributeError:
+            pass
+        try:
             return _get_args_count_helper(function, inspect.getargspec)
+        except TypeError:
+            # callables which are not functions, like LazyFunction, have
+            # no signature on Python 2 and may give their arity instead
+            if not hasattr(function, 'arity'):
+                raise
+            return function.arity
         
+
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+_monotonic = getattr(time, 'monotonic', time.time)
+
+
+class LRUCache(object):
+    """A thread safe mapping which holds a bounded number of items.
+
+    When the cache is full, the least recently used item is evicted to
+    make room for a new one.
+
+    Parameters
+    ----------
+    maxsize : int
+        maximum number of items held by the cache.
+    ttl : float
+        number of seconds after which an item expires, None for items
+        which never expire.(Default None)
+    """
+    def __init__(self, maxsize=128, ttl=None):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be a positive number")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getstate__(self):
+        # only the limits are kept, the cached items of another process
+        # are not worth sending along
+        return {'maxsize': self.maxsize, 'ttl': self.ttl}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'], state.get('ttl'))
+
+    def get(self, key, default=None):
+        """Return the value for `key` if present, else `default`."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self._misses += 1
+                return default
+            if self.ttl is not None:
+                value, expires = value
+                if expires <= _monotonic():
+                    self._misses += 1
+                    return default
+                self._data[key] = (value, expires)
+            else:
+                self._data[key] = value
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store `value` for `key`, evicting the oldest item if needed."""
+        if self.ttl is not None:
+            value = (value, _monotonic() + self.ttl)
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def copy(self, keep=None):
+        """Return a new cache holding the same items, oldest first.
+
+        Parameters
+        ----------
+        keep : function
+            called with every key, only the items for which it returns
+            True are copied. By default every item is copied.
+
+        Returns
+        -------
+        cache : LRUCache
+            a cache with the same `maxsize` and `ttl`, whose statistics
+            start at zero.
+        """
+        cache = LRUCache(self.maxsize, self.ttl)
+        with self._lock:
+            if keep is None:
+                cache._data.update(self._data)
+            else:
+                cache._data.update((key, value)
+                                   for key, value in self._data.items()
+                                   if keep(key))
+        return cache
+
+    def clear(self):
+        """Remove all the items and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self._hits = self._misses = 0
+
+    def info(self):
+        """Return a CacheInfo with the statistics of the cache."""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses,
+                             self.maxsize, len(self._data))
@@ -1,6 +1,33 @@
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from botify import Botify, Context
-from botify.utils import get_args_count
+from botify import (Botify, BudgetExceededError, Context, CompiledBot,
+                    MetricsHook, ParseSession, RegexTokenizer,
+                    StreamWindowError, load_snapshot, vectorized)
+from botify.compiled import TaskDef
+from botify.engine import KIND_DATA, Node, NodeList, TaskNode, is_linked
+from botify.snapshot import (LazyFunction, dump_snapshot,
+                             restore_snapshot)
+from botify.tokenizer import TOKEN_DATA, TOKEN_WORD, KeywordTrie
+from botify.trace import TraceRecord
+from botify.typo import TypoIndex, edit_distance
+from botify import utils
+from botify.utils import LRUCache, get_args_count
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from concurrent import futures
+except ImportError:
+    futures = None
 
 
 class BotifyTestCase(unittest.TestCase):
@@ -53,6 +80,1333 @@ class BotifyTestCase(unittest.TestCase):
         self.assertEqual(len(result), 0)
         self.assertEqual(self.flag, 1)
 
+def is_number(value):
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def add(a, b):
+    return a + b
+
+
+def multiply(a, b):
+    return a * b
+
+
+def factorial(a):
+    result = 1
+    for i in range(2, int(a) + 1):
+        result *= i
+    return result
+
+
+def make_calculator():
+    bot = Botify(is_number, float)
+    bot.add_task(('plus', 'add'), Context(add, 1), (-1, 1))
+    bot.add_task(('times',), Context(multiply, 2), (-1, 1))
+    bot.add_task(('factorial',), Context(factorial, 3), (-1,))
+    bot.add_modifier('of', ('factorial',), -1, Botify.ACTION_UPDATE_RULE, (1,))
+    return bot
+
+
+CALCULATOR_INPUTS = (
+    "what is 2 plus 3",
+    "2 plus 3 times 4",
+    "2 times 3 plus 4 times 5",
+    "1 plus 2 plus 3 plus 4",
+    "5 factorial plus 1",
+    "factorial of 4 times 2",
+    "2 add 3",
+    "7",
+)
+
+
+class CompiledBotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_compile_returns_compiled_bot(self):
+        self.assertTrue(isinstance(self.bot.compile(), CompiledBot))
+
+    def test_same_results_as_parse(self):
+        compiled = self.bot.compile()
+        for text in CALCULATOR_INPUTS:
+            self.assertEqual(compiled.parse(text), self.bot.parse(text))
+
+    def test_calculator_results(self):
+        self.assertEqual(self.bot.parse("2 plus 3 times 4"), (14.0,))
+        self.assertEqual(self.bot.parse("factorial of 4 times 2"), (48,))
+
+    def test_compiled_is_frozen(self):
+        compiled = self.bot.compile()
+        self.bot.add_task(('minus',), Context(lambda a, b: a - b, 1), (-1, 1))
+        self.assertEqual(self.bot.parse("5 minus 3"), (2.0,))
+        self.assertEqual(compiled.parse("5 minus 3"), (5.0, 3.0))
+
+    def test_unable_to_parse(self):
+        compiled = self.bot.compile()
+        self.assertRaises(ValueError, compiled.parse, "plus 3")
+
+    def test_pickle(self):
+        compiled = pickle.loads(pickle.dumps(self.bot.compile()))
+        for text in CALCULATOR_INPUTS:
+            self.assertEqual(compiled.parse(text), self.bot.parse(text))
+
+    def test_nonstrict_mode(self):
+        self.bot.add_task(('negate',), Context(lambda a: -a, 1), ())
+        self.assertRaises(ValueError, self.bot.parse, "negate 3")
+        self.bot.strict_mode_enabled = False
+        self.assertEqual(self.bot.parse("negate 3"), (-3.0,))
+
+
+class NodeListTestCase(unittest.TestCase):
+    def test_walk(self):
+        nodes = NodeList(Node(item) for item in 'abcd')
+        first = next(iter(nodes))
+        self.assertEqual(nodes.walk(first, 2).item, 'c')
+        self.assertEqual(nodes.walk(nodes.walk(first, 3), -1).item, 'c')
+        self.assertTrue(nodes.walk(first, -1) is None)
+        self.assertTrue(nodes.walk(first, 4) is None)
+
+    def test_remove(self):
+        nodes = NodeList(Node(item) for item in 'abc')
+        middle = nodes.walk(next(iter(nodes)), 1)
+        nodes.remove(middle)
+        self.assertEqual(nodes.items(), ['a', 'c'])
+        self.assertEqual(len(nodes), 2)
+        self.assertFalse(is_linked(middle))
+
+
+class TaskNodeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.definition = TaskDef(Context(add, 1), (-1, 1), 2, 'plus')
+
+    def test_shares_definition(self):
+        node = TaskNode(self.definition)
+        self.assertTrue(node.item is self.definition)
+        self.assertEqual(node.keyword, 'plus')
+        self.assertEqual(node.rule, (-1, 1))
+        self.assertTrue(node.override is None)
+
+    def test_override_is_copy_on_write(self):
+        first = TaskNode(self.definition)
+        second = TaskNode(self.definition)
+        first.rule = (1,)
+        self.assertEqual(first.rule, (1,))
+        self.assertEqual(first.context, self.definition.context)
+        self.assertEqual(second.rule, (-1, 1))
+        self.assertTrue(second.override is None)
+        self.assertEqual(self.definition.rule, (-1, 1))
+
+    def test_set_result(self):
+        node = TaskNode(self.definition)
+        node.context = Context(multiply, 2)
+        node.set_result(5.0)
+        self.assertEqual(node.item, 5.0)
+        self.assertTrue(node.kind is KIND_DATA)
+        self.assertTrue(node.override is None)
+
+    def test_modifiers_do_not_change_definitions(self):
+        compiled = make_calculator().compile()
+        self.assertEqual(compiled.parse("factorial of 4 times 2"), (48.0,))
+        self.assertEqual(compiled.parse("4 factorial"), (24.0,))
+        self.assertEqual(compiled._tasks['factorial'].rule, (-1,))
+
+
+class EvaluationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_long_chain(self):
+        text = ' plus '.join(['1 times 2'] * 5000)
+        session = self.bot.parse_session(text, trace=True)
+        self.assertEqual(session.result, (10000.0,))
+        self.assertEqual(len(session.report), 9999)
+
+    def test_task_without_data_result_is_removed(self):
+        self.bot.add_task(('show',), Context(lambda a: None, 0), (-1,))
+        self.assertEqual(self.bot.parse("2 plus 3 show"), ())
+
+    def test_neighbour_task_is_resolved_first(self):
+        self.bot.add_task(('double',), Context(lambda a: a * 2, 1), (1,))
+        self.assertEqual(self.bot.parse("3 plus double 4"), (11.0,))
+
+
+class ResolverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.bot.add_task(('minus',), Context(lambda a: -a, 1), (1,))
+
+    def test_deep_dependency_chain(self):
+        text = 'minus ' * 3000 + '1'
+        session = self.bot.parse_session(text, trace=True)
+        self.assertEqual(session.result, (1.0,))
+        self.assertEqual(len(session.report), 3000)
+
+    def test_cycle_between_tasks(self):
+        self.bot.add_task(('left',), Context(lambda a: a, 1), (1, -1))
+        self.bot.add_task(('right',), Context(lambda a: -a, 1), (-1, 1))
+        self.assertEqual(self.bot.parse("3 left right"), (-3.0,))
+
+    def test_strict_and_nonstrict_modes(self):
+        self.bot.add_task(('half',), Context(lambda a: a / 2, 1), (1,))
+        self.assertRaises(ValueError, self.bot.parse, "8 half")
+        self.bot.strict_mode_enabled = False
+        self.assertEqual(self.bot.parse("8 half"), (4.0,))
+        self.assertEqual(self.bot.parse("minus 8 half"), (-4.0,))
+
+    def test_data_reached_twice(self):
+        self.bot.add_task(('less',), Context(lambda a, b: a - b, 0),
+                          (-1, -3, 1))
+        self.bot.add_task(('diff',), Context(lambda a, b: a - b, 2),
+                          (-2, 2, 3, -1))
+        self.assertRaises(ValueError, self.bot.parse, "9 1 diff 5 less")
+
+    def test_data_taken_by_neighbour(self):
+        self.bot.add_task(('less',), Context(lambda a, b: a - b, 1), (-2, 3))
+        self.bot.strict_mode_enabled = False
+        self.assertRaises(ValueError, self.bot.parse,
+                          "less less 3 7 less 3")
+
+
+class GrammarUpdateTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_versions(self):
+        version = self.bot.version
+        self.bot.add_task(('minus',), Context(lambda a, b: a - b, 1), (-1, 1))
+        self.assertEqual(self.bot.version, version + 1)
+        with self.bot.bulk_update() as bot:
+            bot.add_task(('over',), Context(lambda a, b: a / b, 2), (-1, 1))
+            bot.add_modifier('twice', ('plus',), 1,
+                             Botify.ACTION_UPDATE_CONTEXT,
+                             Context(multiply, 1))
+            self.assertEqual(self.bot.version, version + 1)
+        self.assertEqual(self.bot.version, version + 2)
+        self.assertEqual(self.bot.compile().version, version + 2)
+
+    def test_bulk_update_is_atomic(self):
+        self.bot.parse("2 plus 3")
+        version = self.bot.version
+        with self.bot.bulk_update():
+            self.bot.add_task(('plus',), Context(multiply, 1), (-1, 1))
+            self.assertEqual(self.bot.parse("2 plus 3"), (5.0,))
+        self.assertEqual(self.bot.parse("2 plus 3"), (6.0,))
+
+        def failing_update():
+            with self.bot.bulk_update():
+                self.bot.add_task(('plus',), Context(add, 1), (-1, 1))
+                raise RuntimeError
+        self.assertRaises(RuntimeError, failing_update)
+        self.assertEqual(self.bot.version, version + 1)
+        self.assertEqual(self.bot.parse("2 plus 3"), (6.0,))
+
+    def test_incremental_update(self):
+        compiled = self.bot._get_compiled()
+        self.bot.add_task(('minus',), Context(lambda a, b: a - b, 1), (-1, 1))
+        self.bot.add_task(('divided by',), Context(lambda a, b: a / b, 2),
+                          (-1, 1))
+        self.bot.add_modifier('of', ('times',), -1,
+                              Botify.ACTION_UPDATE_RULE, (1, 2))
+        # the changes are compiled into the grammar on the next parse
+        self.assertTrue(self.bot._outdated is compiled)
+        updated = self.bot._get_compiled()
+        self.assertTrue(updated is not compiled)
+        self.assertTrue(updated._parse_ids is compiled._parse_ids)
+        self.assertEqual(self.bot.parse("8 divided by 2 minus 1"), (3.0,))
+        self.assertEqual(self.bot.parse("times of 2 3"), (6.0,))
+        self.assertEqual(compiled.parse("8 minus 1"), (8.0, 1.0))
+        self.assertRaises(ValueError, compiled.parse, "times of 2 3")
+        self.assertEqual(updated._priorities,
+                         self.bot.compile()._priorities)
+        self.assertEqual(updated.modifier_issues, ())
+
+    def test_typo_index_update(self):
+        self.bot.enable_typo_tolerance()
+        self.bot.parse("2 plsu 3")
+        self.bot.add_task(('minus',), Context(lambda a, b: a - b, 1), (-1, 1))
+        self.assertEqual(self.bot.parse("5 minsu 3"), (2.0,))
+
+    def test_parses_see_one_version(self):
+        def constant(value):
+            return lambda: value
+
+        def update(version):
+            with self.bot.bulk_update():
+                for keyword in ('left', 'right'):
+                    self.bot.add_task((keyword,),
+                                      Context(constant(version), 1), ())
+
+        update(0)
+        done = []
+        results = []
+
+        def parse():
+            while not done:
+                results.append(self.bot.parse("left right"))
+
+        threads = [threading.Thread(target=parse) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        try:
+            for version in range(1, 200):
+                update(version)
+        finally:
+            done.append(True)
+            for thread in threads:
+                thread.join()
+        self.assertTrue(results)
+        for left, right in results:
+            self.assertEqual(left, right)
+
+    def test_parse_during_bulk_update(self):
+        self.bot.parse("2 plus 3")
+        self.bot.add_task(('minus',), Context(lambda a, b: a - b, 1), (-1, 1))
+        started = threading.Event()
+        release = threading.Event()
+
+        def update():
+            with self.bot.bulk_update():
+                self.bot.add_task(('over',), Context(lambda a, b: a / b, 2),
+                                  (-1, 1))
+                started.set()
+                release.wait(10)
+
+        results = []
+        updating = threading.Thread(target=update)
+        updating.start()
+        try:
+            started.wait(10)
+            # the grammar is outdated, so this parse compiles the changes
+            parsing = threading.Thread(
+                target=lambda: results.append(self.bot.parse("5 minus 3")))
+            parsing.start()
+            parsing.join(5)
+            self.assertFalse(parsing.is_alive())
+        finally:
+            release.set()
+            updating.join()
+        self.assertEqual(results, [(2.0,)])
+        self.assertEqual(self.bot.parse("6 over 3"), (2.0,))
+
+    def test_concurrent_modifier_updates(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def update():
+            with self.bot.bulk_update():
+                self.bot.add_modifier('twice', ('plus',), 1,
+                                      Botify.ACTION_UPDATE_CONTEXT,
+                                      Context(multiply, 1))
+                started.set()
+                release.wait(10)
+
+        updating = threading.Thread(target=update)
+        updating.start()
+        try:
+            started.wait(10)
+            self.bot.add_modifier('twice', ('times',), 1,
+                                  Botify.ACTION_UPDATE_CONTEXT,
+                                  Context(add, 1))
+        finally:
+            release.set()
+            updating.join()
+        # neither update overwrote the other
+        self.assertEqual(self.bot.parse("2 twice plus 3"), (6.0,))
+        self.assertEqual(self.bot.parse("2 twice times 3"), (5.0,))
+
+
+class PlanCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.bot.enable_plan_cache(maxsize=2)
+
+    def test_disabled_by_default(self):
+        self.assertEqual(make_calculator().plan_cache_info(), None)
+
+    def test_hit_reuses_plan(self):
+        self.assertEqual(self.bot.parse("2 plus 3 times 4"), (14.0,))
+        session = self.bot.parse_session("5 plus 1 times 7", trace=True)
+        self.assertEqual(session.result, (12.0,))
+        self.assertEqual(session.report[0]['parameters'], (1.0, 7.0))
+        info = self.bot.plan_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 1, 1))
+
+    def test_same_results_as_parse(self):
+        uncached = make_calculator()
+        for text in CALCULATOR_INPUTS + CALCULATOR_INPUTS:
+            self.assertEqual(self.bot.parse(text), uncached.parse(text))
+
+    def test_modifiers_deleting_data(self):
+        self.bot.add_modifier('skip', ('plus',), 1, Botify.ACTION_DELETE, -1)
+        self.assertEqual(self.bot.parse("1 2 skip plus 3"), (4.0,))
+        self.assertEqual(self.bot.parse("5 6 skip plus 7"), (12.0,))
+        self.assertEqual(self.bot.plan_cache_info().hits, 1)
+
+    def test_result_not_fitting_plan(self):
+        self.bot.add_task(('check',), Context(lambda a: a or None, 1), (1,))
+        self.assertEqual(self.bot.parse("check 0"), ())
+        self.assertEqual(self.bot.parse("check 3"), (3.0,))
+        self.assertEqual(self.bot.parse("check 5"), (5.0,))
+        self.assertEqual(self.bot.plan_cache_info().hits, 2)
+
+    def test_invalidated_by_add_task(self):
+        self.bot.parse("2 plus 3")
+        self.bot.add_task(('plus',), Context(multiply, 1), (-1, 1))
+        self.assertEqual(self.bot.parse("2 plus 3"), (6.0,))
+        self.assertEqual(self.bot.plan_cache_info().hits, 0)
+
+    def test_unrelated_plans_kept(self):
+        self.bot.parse("2 plus 3")
+        self.bot.parse("2 times 3")
+        self.bot.add_modifier('twice', ('times',), 1,
+                              Botify.ACTION_UPDATE_CONTEXT,
+                              Context(add, 2))
+        self.bot.add_task(('times',), Context(lambda a, b: a / b, 2), (-1, 1))
+        self.assertEqual(self.bot.plan_cache_info().currsize, 1)
+        self.assertEqual(self.bot.parse("4 plus 5"), (9.0,))
+        self.assertEqual(self.bot.parse("4 times 5"), (0.8,))
+        self.assertEqual(self.bot.plan_cache_info().hits, 1)
+
+    def test_eviction(self):
+        for text in ("1 plus 2", "1 times 2", "factorial of 3"):
+            self.bot.parse(text)
+        self.assertEqual(self.bot.plan_cache_info().currsize, 2)
+
+
+class ResultCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.bot = make_calculator()
+        self.bot.add_task(('cubed',), Context(self.cube, 3, True), (-1,))
+
+    def cube(self, a):
+        self.calls.append(a)
+        return a ** 3
+
+    def test_pure_tasks_are_cached(self):
+        self.bot.enable_result_cache(maxsize=8)
+        self.assertEqual(self.bot.parse("2 cubed plus 3 cubed"), (35.0,))
+        self.assertEqual(self.bot.parse("3 cubed times 2 cubed"), (216.0,))
+        self.assertEqual(self.calls, [2.0, 3.0])
+        info = self.bot.result_cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (2, 2, 2))
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.bot.result_cache_info(), None)
+        self.bot.parse("2 cubed")
+        self.bot.parse("2 cubed")
+        self.assertEqual(self.calls, [2.0, 2.0])
+
+    def test_impure_tasks_are_not_cached(self):
+        self.bot.enable_result_cache()
+        self.bot.parse("2 plus 3")
+        self.bot.parse("2 plus 3")
+        self.assertEqual(self.bot.result_cache_info().currsize, 0)
+
+    def test_plan_cache(self):
+        self.bot.enable_result_cache()
+        self.bot.enable_plan_cache()
+        for _ in range(3):
+            self.assertEqual(self.bot.parse("2 cubed plus 1"), (9.0,))
+        self.assertEqual(self.calls, [2.0])
+        self.assertEqual(self.bot.plan_cache_info().hits, 2)
+
+    def test_kept_by_add_task(self):
+        self.bot.enable_result_cache()
+        self.bot.parse("2 cubed")
+        self.bot.add_task(('sum',), Context(add, 1), (-1, 1))
+        self.bot.parse("2 cubed")
+        self.assertEqual(self.calls, [2.0])
+
+    def test_pure_context_is_a_pair(self):
+        context = Context(add, 1, True)
+        function, priority = context
+        self.assertEqual((function, priority), (add, 1))
+        self.assertEqual(context, (add, 1))
+        self.assertTrue(pickle.loads(pickle.dumps(context)).pure)
+        self.assertFalse(Context(add, 1).pure)
+
+    def test_equal_data_of_other_types(self):
+        bot = Botify(is_number,
+                     lambda token: int(token) if token.isdigit() else
+                     float(token))
+        bot.add_task(('id',), Context(lambda a: a, 1, True), (1,))
+        bot.enable_result_cache()
+        self.assertEqual(type(bot.parse("id 1")[0]), int)
+        self.assertEqual(type(bot.parse("id 1.0")[0]), float)
+
+    def test_ttl(self):
+        now = [0.0]
+        monotonic = utils._monotonic
+        utils._monotonic = lambda: now[0]
+        try:
+            cache = LRUCache(4, ttl=10)
+            cache.put('a', 1)
+            now[0] = 9.0
+            self.assertEqual(cache.get('a'), 1)
+            now[0] = 10.0
+            self.assertEqual(cache.get('a'), None)
+            self.assertEqual(cache.info().hits, 1)
+            self.assertEqual(cache.info().misses, 1)
+        finally:
+            utils._monotonic = monotonic
+
+    def test_invalid_options(self):
+        self.assertRaises(ValueError, self.bot.enable_result_cache, 0)
+        self.assertRaises(ValueError, self.bot.enable_result_cache, 8, 0)
+
+
+class BudgetTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def assertExceeds(self, limit, text):
+        try:
+            self.bot.parse(text)
+        except BudgetExceededError as e:
+            self.assertEqual(e.limit, limit)
+            self.assertTrue(isinstance(e, ValueError))
+        else:
+            self.fail("BudgetExceededError not raised")
+
+    def test_max_tokens(self):
+        self.bot.enable_budget(max_tokens=5)
+        self.assertEqual(self.bot.parse("2 plus 3 times 4"), (14.0,))
+        self.assertExceeds('max_tokens', "1 plus 2 plus 3 plus 4")
+
+    def test_max_reductions(self):
+        self.bot.enable_budget(max_reductions=3)
+        self.assertEqual(self.bot.parse("1 plus 2 plus 3 plus 4"), (10.0,))
+        self.assertExceeds('max_reductions', "1 plus 2 plus 3 plus 4 plus 5")
+
+    def test_max_reductions_with_plan_cache(self):
+        self.bot.enable_budget(max_reductions=1)
+        self.bot.enable_plan_cache()
+        self.bot.parse("1 plus 2")
+        self.assertEqual(self.bot.parse("1 plus 3"), (4.0,))
+        self.assertExceeds('max_reductions', "1 plus 2 plus 3")
+
+    def test_max_resolver_steps(self):
+        self.bot.enable_budget(max_resolver_steps=10)
+        self.bot.parse("1 plus 2 plus 3")
+        self.assertExceeds('max_resolver_steps',
+                           ' plus '.join(['1'] * 20))
+
+    def test_timeout(self):
+        def slow_add(a, b):
+            time.sleep(0.02)
+            return a + b
+
+        self.bot.add_task(('plus',), Context(slow_add, 1), (-1, 1))
+        self.bot.enable_budget(timeout=0.03)
+        self.assertExceeds('timeout', "1 plus 2 plus 3 plus 4")
+
+    def test_arity_check(self):
+        calls = []
+
+        def counted_multiply(a, b):
+            calls.append((a, b))
+            return a * b
+
+        self.bot.add_task(('times',), Context(counted_multiply, 2), (-1, 1))
+        self.assertRaises(ValueError, self.bot.parse, "2 times 3 plus")
+        self.assertEqual(len(calls), 1)
+        self.bot.enable_budget()
+        self.assertRaises(ValueError, self.bot.parse, "2 times 3 plus")
+        self.assertEqual(len(calls), 1)
+        self.bot.enable_budget(check_arity=False)
+        self.assertRaises(ValueError, self.bot.parse, "2 times 3 plus")
+        self.assertEqual(len(calls), 2)
+
+    def test_arity_check_allows_results_as_data(self):
+        self.bot.enable_budget()
+        self.assertEqual(self.bot.parse("factorial of 3 factorial"), (720,))
+        self.assertEqual(self.bot.parse("2 plus 3 times 4 plus 1"), (15.0,))
+
+    def test_disable(self):
+        self.bot.enable_budget(max_tokens=1)
+        self.bot.disable_budget()
+        self.assertEqual(self.bot.parse("2 plus 3"), (5.0,))
+
+    @unittest.skipIf(futures is None, "concurrent.futures is not installed")
+    def test_parse_many(self):
+        self.bot.enable_budget(max_tokens=3)
+        outcomes = self.bot.parse_many(["2 plus 3", "1 plus 2 plus 3"],
+                                       executor=Botify.EXECUTOR_PROCESS,
+                                       max_workers=1)
+        self.assertEqual(outcomes[0].result, (5.0,))
+        self.assertEqual(outcomes[1].error.limit, 'max_tokens')
+
+
+class TraceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_off_by_default(self):
+        session = self.bot.parse_session("2 plus 3")
+        self.assertEqual(session.trace, None)
+        self.assertEqual(session.report, [])
+        self.assertEqual(self.bot.get_trace(), [])
+
+    def test_single_traced_parse(self):
+        session = self.bot.parse_session("2 plus 3", trace=True)
+        self.assertEqual(session.report, [{'function': 'add',
+                                           'parameters': (2.0, 3.0),
+                                           'result': 5.0}])
+
+    def test_full(self):
+        self.bot.set_trace_level(Botify.TRACE_FULL, buffer_size=3)
+        first = self.bot.parse_session("2 plus 3 times 4")
+        second = self.bot.parse_session("1 plus 1")
+        self.assertEqual(self.bot.get_trace(),
+                         [TraceRecord(first.parse_id, 'multiply',
+                                      (3.0, 4.0), 12.0),
+                          TraceRecord(first.parse_id, 'add',
+                                      (2.0, 12.0), 14.0),
+                          TraceRecord(second.parse_id, 'add',
+                                      (1.0, 1.0), 2.0)])
+        self.bot.parse("5 times 5")
+        trace = self.bot.get_trace()
+        self.assertEqual(len(trace), 3)
+        self.assertEqual(trace[-1].function, 'multiply')
+        self.assertEqual(trace[0].parse_id, first.parse_id)
+
+    def test_failed_parse_is_traced(self):
+        self.bot.set_trace_level(Botify.TRACE_FULL)
+        self.assertRaises(ValueError, self.bot.parse, "2 times 3 plus")
+        self.assertEqual([record.function for record in self.bot.get_trace()],
+                         ['multiply'])
+
+    def test_sampled(self):
+        self.bot.set_trace_level(Botify.TRACE_SAMPLED, sample_rate=4)
+        sessions = [self.bot.parse_session("1 plus 2") for _ in range(8)]
+        self.assertEqual(len([s for s in sessions if s.trace is not None]), 2)
+        self.assertEqual(len(self.bot.get_trace()), 2)
+
+    def test_unknown_level(self):
+        self.assertRaises(ValueError, self.bot.set_trace_level, 'verbose')
+
+    def test_parse_ids(self):
+        first = self.bot.parse_session("2 plus 3").parse_id
+        self.bot.add_task(('sum',), Context(add, 1), (-1, 1))
+        # an updated grammar goes on with the ids of the previous version
+        second = self.bot.parse_session("2 sum 3").parse_id
+        self.assertTrue(second > first)
+        compiled = pickle.loads(pickle.dumps(self.bot.compile()))
+        self.assertTrue(compiled.parse_session("2 plus 3").parse_id > 0)
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.bot.get_metrics(), None)
+        self.assertEqual(self.bot.parse_session("2 plus 3").metrics, None)
+
+    def test_counters(self):
+        self.bot.enable_metrics()
+        self.bot.parse("2 plus 3 times 4")
+        metrics = self.bot.get_metrics()
+        self.assertEqual(metrics['parses'], 1)
+        self.assertEqual(metrics['failures'], 0)
+        self.assertEqual(metrics['task_calls'], 2)
+        # 2 calls for each of the 3 numbers, 1 for each keyword and 1 for
+        # each task result
+        self.assertEqual(metrics['callback_calls'], 10)
+        self.assertTrue(metrics['resolver_steps'] >= 4)
+        self.assertEqual(metrics['nonstrict_fallbacks'], 0)
+        for phase in ('tokenize', 'modifiers', 'evaluate', 'tasks'):
+            self.assertTrue(metrics['phase_times'][phase] > 0)
+        self.assertTrue(metrics['phase_times']['evaluate']
+                        >= metrics['phase_times']['tasks'])
+
+    def test_failures_and_fallbacks(self):
+        self.bot.enable_metrics()
+        self.assertRaises(ValueError, self.bot.parse, "plus 3")
+        self.bot.strict_mode_enabled = False
+        self.assertEqual(self.bot.parse("plus 2 3"), (5.0,))
+        metrics = self.bot.get_metrics()
+        self.assertEqual(metrics['parses'], 2)
+        self.assertEqual(metrics['failures'], 1)
+        self.assertEqual(metrics['nonstrict_fallbacks'], 1)
+
+    def test_hooks(self):
+        class Collector(MetricsHook):
+            def __init__(self):
+                self.samples = []
+
+            def on_parse(self, sample):
+                self.samples.append(sample)
+
+        collector = Collector()
+        self.bot.enable_metrics([collector])
+        session = self.bot.parse_session("2 plus 3")
+        self.assertEqual(collector.samples, [session.metrics])
+        self.assertEqual(collector.samples[0].task_calls, 1)
+        self.assertFalse(collector.samples[0].failed)
+
+    def test_plan_cache(self):
+        self.bot.enable_plan_cache()
+        self.bot.enable_metrics()
+        self.bot.parse("2 plus 3")
+        self.bot.parse("4 plus 5")
+        metrics = self.bot.get_metrics()
+        self.assertEqual(metrics['task_calls'], 2)
+        self.assertTrue(metrics['phase_times']['plan'] > 0)
+
+    def test_disable(self):
+        self.bot.enable_metrics()
+        self.bot.parse("2 plus 3")
+        self.bot.disable_metrics()
+        self.assertEqual(self.bot.get_metrics(), None)
+        self.assertEqual(self.bot.parse_session("2 plus 3").metrics, None)
+
+
+class ParseManyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.texts = list(CALCULATOR_INPUTS) * 5 + ["plus 3"]
+        self.expected = [self.bot.parse(text) for text in self.texts[:-1]]
+
+    def check_outcomes(self, outcomes):
+        self.assertEqual(len(outcomes), len(self.texts))
+        self.assertEqual([outcome.result for outcome in outcomes[:-1]],
+                         self.expected)
+        self.assertTrue(all(outcome.error is None
+                            for outcome in outcomes[:-1]))
+        self.assertEqual(outcomes[-1].result, None)
+        self.assertTrue(isinstance(outcomes[-1].error, ValueError))
+
+    def test_serial(self):
+        self.check_outcomes(self.bot.parse_many(self.texts))
+
+    @unittest.skipIf(futures is None, "concurrent.futures is not installed")
+    def test_thread(self):
+        self.check_outcomes(self.bot.parse_many(
+            self.texts, executor=Botify.EXECUTOR_THREAD, max_workers=4,
+            chunksize=3))
+
+    @unittest.skipIf(futures is None, "concurrent.futures is not installed")
+    def test_process(self):
+        self.check_outcomes(self.bot.parse_many(
+            self.texts, executor=Botify.EXECUTOR_PROCESS, max_workers=2))
+
+    @unittest.skipIf(futures is None, "concurrent.futures is not installed")
+    def test_process_metrics_and_trace(self):
+        samples = []
+        hook = MetricsHook()
+        hook.on_parse = samples.append
+        self.bot.enable_metrics([hook])
+        self.bot.set_trace_level(Botify.TRACE_FULL)
+        self.bot.parse_many(self.texts, executor=Botify.EXECUTOR_PROCESS,
+                            max_workers=2, chunksize=4)
+        metrics = self.bot.get_metrics()
+        self.assertEqual((metrics['parses'], metrics['failures']),
+                         (len(self.texts), 1))
+        parse_ids = [sample.parse_id for sample in samples]
+        self.assertEqual(len(set(parse_ids)), len(self.texts))
+        trace = self.bot.get_trace()
+        self.bot.parse_many(self.texts)
+        self.assertEqual([record[1:] for record in trace],
+                         [record[1:]
+                          for record in self.bot.get_trace()[len(trace):]])
+        self.assertTrue(set(record.parse_id for record in trace)
+                        <= set(parse_ids))
+
+    def test_unknown_executor(self):
+        self.assertRaises(ValueError, self.bot.parse_many, self.texts,
+                          executor='gpu')
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio needs Python 3.5")
+class AsyncParseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.running = 0
+        self.max_running = 0
+
+    def run_async(self, coroutine):
+        import asyncio
+        return asyncio.new_event_loop().run_until_complete(coroutine)
+
+    def add_lookup_task(self):
+        from test_aio import make_lookup
+        self.bot.add_task(('lookup',), Context(make_lookup(self), 2), (1,))
+
+    def test_same_results_as_parse(self):
+        for text in CALCULATOR_INPUTS:
+            self.assertEqual(self.run_async(self.bot.parse_async(text)),
+                             self.bot.parse(text))
+
+    def test_independent_tasks_run_concurrently(self):
+        self.add_lookup_task()
+        text = "lookup 1 plus lookup 2 plus lookup 3"
+        session = self.run_async(self.bot.parse_session_async(text, trace=True))
+        self.assertEqual(session.result, (60.0,))
+        self.assertEqual(self.max_running, 3)
+        self.assertEqual([entry['parameters'] for entry in session.report],
+                         [(1.0,), (2.0,), (3.0,), (10.0, 20.0),
+                          (30.0, 30.0)])
+
+    def test_dependent_tasks(self):
+        self.add_lookup_task()
+        text = "lookup lookup 2 times 3"
+        session = self.run_async(self.bot.parse_session_async(text, trace=True))
+        self.assertEqual(session.result, (600.0,))
+        self.assertEqual(self.max_running, 1)
+        self.assertEqual([entry['parameters'] for entry in session.report],
+                         [(2.0,), (20.0,), (200.0, 3.0)])
+
+    def test_unable_to_parse(self):
+        self.assertRaises(ValueError, self.run_async,
+                          self.bot.parse_async("plus 3"))
+
+    def test_budget(self):
+        text = "1 times 2 plus 3 times 4"
+        self.bot.enable_budget(max_resolver_steps=2)
+        self.assertRaises(BudgetExceededError, self.bot.parse, text)
+        self.assertRaises(BudgetExceededError, self.run_async,
+                          self.bot.parse_async(text))
+
+    def test_resolver_steps(self):
+        self.bot.enable_metrics()
+        for text in CALCULATOR_INPUTS:
+            self.bot.parse(text)
+        steps = self.bot.get_metrics()['resolver_steps']
+        self.bot.enable_metrics()
+        for text in CALCULATOR_INPUTS:
+            self.run_async(self.bot.parse_async(text))
+        self.assertEqual(self.bot.get_metrics()['resolver_steps'], steps)
+
+
+@unittest.skipIf(sys.version_info < (3, 5), "asyncio needs Python 3.5")
+class ParseServerTestCase(unittest.TestCase):
+    # seconds after which a test fails instead of waiting for the server
+    timeout = 60
+
+    def run_with_server(self, client, **options):
+        import asyncio
+        from test_aio import serve
+
+        errors = []
+        loop = asyncio.new_event_loop()
+        loop.set_exception_handler(lambda loop, context:
+                                   errors.append(context['message']))
+        try:
+            result = loop.run_until_complete(asyncio.wait_for(
+                serve(make_calculator(), client, **options), self.timeout))
+        finally:
+            loop.close()
+        self.assertEqual(errors, [])
+        return result
+
+    def test_responses(self):
+        from test_aio import send_requests
+        responses, stats = self.run_with_server(send_requests)
+        self.assertEqual(responses[0], {'id': 1, 'result': [14.0]})
+        self.assertEqual((responses[1]['id'], responses[1]['type']),
+                         (2, 'ValueError'))
+        self.assertTrue(responses[2]['error'].startswith('Bad request'))
+        self.assertEqual(stats['requests'], 2)
+
+    def test_long_line(self):
+        from test_aio import send_long_line
+        responses, stats = self.run_with_server(send_long_line)
+        self.assertEqual(responses, [
+            {'id': None, 'error': 'Bad request: line too long',
+             'type': 'ValueError'},
+            {'id': 2, 'result': [5.0]}])
+        self.assertEqual(stats['requests'], 1)
+
+    def test_load(self):
+        from test_aio import load
+        client = load(CALCULATOR_INPUTS, connections=3, requests=300,
+                      pipeline=8)
+        results, stats = self.run_with_server(client, max_pending=4,
+                                              batch_size=8)
+        self.assertEqual(results['requests'], 300)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(stats['requests'], 300)
+        self.assertTrue(stats['batches'] < 300)
+
+    def test_process_executor(self):
+        from test_aio import load
+        client = load(["2 plus 3", "plus"], connections=2, requests=20)
+        results, _ = self.run_with_server(client,
+                                          executor=Botify.EXECUTOR_PROCESS)
+        self.assertEqual(results['requests'], 20)
+        self.assertEqual(results['errors'], 10)
+
+
+class TokenClassificationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.bot = Botify(self.is_data, self.clean)
+        self.bot.add_task(('plus',), Context(add, 1), (-1, 1))
+
+    def is_data(self, value):
+        self.calls.append(value)
+        return is_number(value)
+
+    def clean(self, value):
+        self.calls.append(('clean', value))
+        return float(value)
+
+    def test_callback_runs_once_per_token(self):
+        self.assertEqual(self.bot.parse("2 plus 3 plus 4"), (9.0,))
+        self.assertEqual(self.calls, ['2', ('clean', '2'), 'plus', '3',
+                                      ('clean', '3'), 'plus', '4',
+                                      ('clean', '4'), 5.0, 9.0])
+
+    def test_data_returned_as_dict(self):
+        bot = Botify(lambda token: token == 'x', lambda token: {'x': 1})
+        bot.add_task(('get',), Context(lambda d: d['x'] + 1, 1), (1,))
+        self.assertEqual(bot.parse("get x"), ())
+        self.assertEqual(bot.parse("x"), ({'x': 1},))
+
+    def test_token_cache(self):
+        self.bot.enable_token_cache(maxsize=8)
+        self.bot.parse("2 plus 3 plus 2")
+        self.bot.parse("3 plus 2")
+        self.assertEqual(self.calls.count('2'), 1)
+        self.assertEqual(self.calls.count(('clean', '3')), 1)
+        info = self.bot.token_cache_info()
+        self.assertEqual((info.hits, info.misses), (5, 3))
+
+
+class PhraseKeywordTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.bot.add_task(('square root',), Context(lambda a: a ** 0.5, 3),
+                          (1,))
+        self.bot.add_task(('square',), Context(lambda a: a * a, 3), (1,))
+        self.bot.add_task(('divided by',), Context(lambda a, b: a / b, 2),
+                          (-1, 1))
+        self.bot.add_modifier('the  square of', ('plus',), 2,
+                              Botify.ACTION_UPDATE_CONTEXT,
+                              Context(multiply, 1))
+
+    def test_phrase_task(self):
+        self.assertEqual(self.bot.parse("square root of 16"), (4.0,))
+        self.assertEqual(self.bot.parse("9 divided by 3"), (3.0,))
+
+    def test_longest_match(self):
+        self.assertEqual(self.bot.parse("square 3"), (9.0,))
+        self.assertEqual(self.bot.parse("square root 9 plus square 2"),
+                         (7.0,))
+
+    def test_incomplete_phrase(self):
+        self.assertEqual(self.bot.parse("9 divided 3"), (9.0, 3.0))
+
+    def test_phrase_modifier(self):
+        self.assertEqual(self.bot.parse("the square of 3 plus 4"), (12.0,))
+
+    def test_trie_match(self):
+        trie = KeywordTrie(['a b', 'a b c', 'b', 'c d'])
+        tokens = 'x a b c d'.split()
+        self.assertEqual(trie.match(tokens, 1), (4, 'a b c'))
+        self.assertEqual(trie.match(tokens, 0), (0, None))
+        self.assertFalse('b' in trie)
+
+
+class TypoToleranceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.bot.add_task(('square root',), Context(lambda a: a ** 0.5, 3),
+                          (1,))
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.bot.parse("2 plsu 3"), (2.0, 3.0))
+
+    def test_corrections(self):
+        self.bot.enable_typo_tolerance()
+        self.assertEqual(self.bot.parse("2 plsu 3"), (5.0,))
+        self.assertEqual(self.bot.parse("2 pluss 3 tmes 4"), (14.0,))
+        self.assertEqual(self.bot.parse("sqare root 16"), (4.0,))
+        self.assertEqual(self.bot.parse("factorail of 3"), (6,))
+
+    def test_data_is_not_corrected(self):
+        self.bot = Botify(lambda token: token.startswith('plum'), str)
+        self.bot.add_task(('plus',), Context(add, 1), (-1, 1))
+        self.bot.enable_typo_tolerance()
+        self.assertEqual(self.bot.parse("plum plus plum"), ('plumplum',))
+
+    def test_max_distance(self):
+        self.bot.enable_typo_tolerance(max_distance=2)
+        self.assertEqual(self.bot.parse("2 pllss 3"), (5.0,))
+        self.bot.enable_typo_tolerance(max_distance=1)
+        self.assertEqual(self.bot.parse("2 pllss 3"), (2.0, 3.0))
+
+    def test_index(self):
+        index = TypoIndex(['plus', 'minus', 'times', 'tines'])
+        self.assertEqual(index.lookup('plus'), 'plus')
+        self.assertEqual(index.lookup('lpus'), 'plus')
+        self.assertEqual(index.lookup('minsu'), 'minus')
+        self.assertEqual(index.lookup('pls'), None)
+        # equally close to times and tines
+        self.assertEqual(index.lookup('tides'), None)
+        self.assertEqual(index.lookup('xyzzy'), None)
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('plus', 'plus'), 0)
+        self.assertEqual(edit_distance('plus', 'plsu'), 1)
+        self.assertEqual(edit_distance('plus', 'minus'), 3)
+        self.assertEqual(edit_distance('', 'abc'), 3)
+
+
+class TokenizerTestCase(unittest.TestCase):
+    def get_tokens(self, tokenizer, text):
+        return [(text[start:end], kind) for start, end, kind in tokenizer(text)]
+
+    def test_punctuation(self):
+        self.assertEqual(self.get_tokens(RegexTokenizer(), "(3+4),"),
+                         [('(', TOKEN_WORD), ('3', TOKEN_WORD),
+                          ('+', TOKEN_WORD), ('4', TOKEN_WORD),
+                          (')', TOKEN_WORD), (',', TOKEN_WORD)])
+
+    def test_numbers_are_data(self):
+        tokenizer = RegexTokenizer(numbers_are_data=True)
+        self.assertEqual(self.get_tokens(tokenizer, "-2.5 minus 3-1e2, is 5."),
+                         [('-2.5', TOKEN_DATA), ('minus', TOKEN_WORD),
+                          ('3', TOKEN_DATA), ('-', TOKEN_WORD),
+                          ('1e2', TOKEN_DATA), (',', TOKEN_WORD),
+                          ('is', TOKEN_WORD), ('5', TOKEN_DATA),
+                          ('.', TOKEN_WORD)])
+
+    def test_whitespace_pattern(self):
+        self.assertEqual(self.get_tokens(RegexTokenizer(r'\S+'), "5, 6"),
+                         [('5,', TOKEN_WORD), ('6', TOKEN_WORD)])
+
+    def test_parse_with_punctuation(self):
+        bot = make_calculator()
+        bot.add_task(('+',), Context(add, 1), (-1, 1))
+        self.assertEqual(bot.parse("What is 2 times (3+4)?"), (10.0,))
+
+    def test_data_kind_skips_callback(self):
+        calls = []
+
+        def is_data(token):
+            calls.append(token)
+            return isinstance(token, float)
+
+        bot = Botify(is_data, float, RegexTokenizer(numbers_are_data=True))
+        bot.add_task(('plus',), Context(add, 1), (-1, 1))
+        self.assertEqual(bot.parse("2 plus 3"), (5.0,))
+        self.assertEqual(calls, ['plus', 5.0])
+
+    def test_custom_tokenizer(self):
+        def tokenize(text):
+            return [(i, i + 1, TOKEN_WORD) for i in range(len(text))
+                    if not text[i].isspace()]
+
+        bot = Botify(is_number, float, tokenize)
+        bot.add_task(('p',), Context(add, 1), (-1, 1))
+        bot.add_task(('sq',), Context(lambda a: a * a, 2), (1,))
+        self.assertEqual(bot.parse("1p2"), (3.0,))
+        self.assertEqual(bot.parse("sq3"), (9.0,))
+
+
+class ModifierIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_out_of_range_target(self):
+        self.assertEqual(self.bot.parse("of 4 factorial"), (24,))
+
+    def test_delete_out_of_range(self):
+        self.bot.add_modifier('skip', ('plus',), 1, Botify.ACTION_DELETE, -5)
+        self.assertEqual(self.bot.parse("1 skip plus 2"), (3.0,))
+
+    def test_several_offsets(self):
+        self.bot.add_modifier('both', ('plus',), -3,
+                              Botify.ACTION_UPDATE_CONTEXT,
+                              Context(multiply, 1))
+        self.bot.add_modifier('both', ('times',), -1,
+                              Botify.ACTION_UPDATE_CONTEXT, Context(add, 2))
+        self.assertEqual(self.bot.parse("2 plus 3 times 5"), (17.0,))
+        self.assertEqual(self.bot.parse("2 plus 3 times both 5"), (16.0,))
+        self.assertEqual(self.bot.parse("2 times 3 times both 5"), (11.0,))
+
+    def test_unknown_action(self):
+        self.assertRaises(ValueError, self.bot.add_modifier, 'of',
+                          ('factorial',), 1, 'explode')
+
+    def test_check_modifiers(self):
+        self.assertEqual(self.bot.check_modifiers(), ())
+        self.bot.add_modifier('of', ('factorial',), -1,
+                              Botify.ACTION_UPDATE_RULE, (1, 2))
+        self.bot.add_modifier('of', ('sqrt',), 1,
+                              Botify.ACTION_UPDATE_RULE, (1,))
+        issues = self.bot.check_modifiers()
+        self.assertEqual([(issue.modifier, issue.keyword, issue.relative_pos)
+                          for issue in issues],
+                         [('of', 'sqrt', 1), ('of', 'factorial', -1)])
+
+
+class DeferredParseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_same_results(self):
+        for text in CALCULATOR_INPUTS:
+            self.assertEqual(self.bot.parse_deferred(text).run(),
+                             self.bot.parse(text))
+
+    def test_nothing_is_run(self):
+        calls = []
+
+        def record(a, b):
+            calls.append((a, b))
+            return a + b
+
+        self.bot.add_task(('sum',), Context(record, 1), (-1, 1))
+        graph = self.bot.parse_deferred("2 sum 3 times 4")
+        self.assertEqual(calls, [])
+        self.assertEqual(repr(graph),
+                         'ExpressionGraph(record(2.0, multiply(3.0, 4.0)))')
+        self.assertEqual(graph.run(), (14.0,))
+        self.assertEqual(calls, [(2.0, 12.0)])
+
+    def test_common_subexpressions(self):
+        calls = []
+
+        def counted_multiply(a, b):
+            calls.append((a, b))
+            return a * b
+
+        self.bot.add_task(('times',), Context(counted_multiply, 2), (-1, 1))
+        graph = self.bot.parse_deferred("2 times 3 plus 2 times 3")
+        # the leaves 2 and 3, a single multiply and add
+        self.assertEqual(len(graph), 4)
+        root = graph.roots[0]
+        self.assertTrue(root.args[0] is root.args[1])
+        self.assertEqual(graph.run(), (12.0,))
+        self.assertEqual(calls, [(2.0, 3.0)])
+
+    def test_reused_results(self):
+        graph = self.bot.parse_deferred("2 plus 3 times 4")
+        results = {}
+        graph.run(results)
+        self.assertEqual(len(results), len(graph))
+        # nodes found in the results are not run again
+        results[graph.roots[0]] = 0.0
+        self.assertEqual(graph.run(results), (0.0,))
+
+    def test_result_which_is_not_data(self):
+        self.bot.add_task(('show',), Context(lambda a: None, 3), (-1,))
+        self.assertEqual(self.bot.parse("2 show 3"), (3.0,))
+        graph = self.bot.parse_deferred("2 show 3")
+        self.assertRaises(ValueError, graph.run)
+
+    def test_unable_to_parse(self):
+        self.assertRaises(ValueError, self.bot.parse_deferred, "plus 3")
+
+
+class StreamParseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_same_results(self):
+        for text in CALCULATOR_INPUTS:
+            expected = list(self.bot.parse(text))
+            self.assertEqual(list(self.bot.parse_stream(text.split(), ' ')),
+                             expected)
+            # chunks may split words
+            self.assertEqual(list(self.bot.parse_stream(iter(text))),
+                             expected)
+
+    def test_phrase_across_chunks(self):
+        self.bot.add_task(('multiplied by',), Context(multiply, 2), (-1, 1))
+        chunks = ["2 multiplied", "by 3 plus 1"]
+        self.assertEqual(list(self.bot.parse_stream(chunks, ' ')), [7.0])
+
+    def test_results_are_yielded_early(self):
+        read = []
+
+        def chunks():
+            for i in range(200):
+                read.append(i)
+                yield "{0} plus {0}".format(i)
+
+        results = self.bot.parse_stream(chunks(), ' ')
+        self.assertEqual(next(results), 0.0)
+        self.assertTrue(len(read) < 200)
+        self.assertEqual(list(results), [2.0 * i for i in range(1, 200)])
+
+    def test_window(self):
+        text = "1 plus " + " times ".join(["2"] * 20)
+        self.assertRaises(StreamWindowError, list,
+                          self.bot.parse_stream(text.split(), ' ', window=2))
+        self.assertEqual(
+            list(self.bot.parse_stream(text.split(), ' ', window=64)),
+            list(self.bot.parse(text)))
+        self.assertRaises(ValueError, list,
+                          self.bot.parse_stream([text], window=0))
+
+    def test_unable_to_parse(self):
+        self.assertRaises(ValueError, list, self.bot.parse_stream(["plus 3"]))
+        self.assertEqual(list(self.bot.parse_stream([])), [])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class ColumnPlanTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+
+    def test_same_results_as_parse(self):
+        plan = self.bot.plan_columns("2 times 3 plus 4")
+        self.assertEqual(plan.columns, 3)
+        x, y, z = [1.0, 2.0, 5.0], [3.0, 0.5, 2.0], [4.0, 4.0, 1.0]
+        result, = plan.run(x, y, z)
+        self.assertEqual(result.tolist(), [
+            self.bot.parse("{0} times {1} plus {2}".format(*row))[0]
+            for row in zip(x, y, z)])
+
+    def test_modifiers_and_scalars(self):
+        plan = self.bot.plan_columns("factorial of 4 times 2")
+        result, = plan.run(numpy.array([3, 4]), 2)
+        self.assertEqual(result.tolist(), [12, 48])
+
+    def test_vectorized_tasks(self):
+        calls = []
+
+        @vectorized
+        def vector_add(a, b):
+            calls.append((a, b))
+            return a + b
+
+        self.bot.add_task(('sum',), Context(vector_add, 1), (-1, 1))
+        plan = self.bot.plan_columns("1 sum 2 times 3")
+        del calls[:]
+        result, = plan.run(numpy.arange(1000.0), 2.0, numpy.ones(1000))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result[10], 12.0)
+
+    def test_wrong_number_of_columns(self):
+        plan = self.bot.plan_columns("2 plus 3")
+        self.assertRaises(ValueError, plan.run, [1.0])
+
+    def test_unable_to_parse(self):
+        self.assertRaises(ValueError, self.bot.plan_columns, "plus 3")
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'grammar.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        self.bot.save_snapshot(self.path)
+        bot = load_snapshot(self.path)
+        self.assertTrue(bot._compiled is not None)
+        # the whole grammar is added as a single version
+        self.assertEqual(bot.version, 1)
+        for text in CALCULATOR_INPUTS:
+            self.assertEqual(bot.parse(text), self.bot.parse(text))
+
+    def test_functions_are_lazy(self):
+        bot = restore_snapshot(dump_snapshot(self.bot))
+        function = bot._tasks['plus']['context'].function
+        self.assertTrue(isinstance(function, LazyFunction))
+        self.assertTrue(function is bot._tasks['add']['context'].function)
+        self.assertTrue(function._function is None)
+        self.assertEqual(bot.parse("2 plus 3"), (5.0,))
+        self.assertTrue(function._function is add)
+        self.assertEqual(bot.parse_session("2 plus 3", trace=True).report,
+                         [{'function': 'add', 'parameters': (2.0, 3.0),
+                           'result': 5.0}])
+
+    def test_not_lazy(self):
+        bot = restore_snapshot(dump_snapshot(self.bot), lazy=False)
+        self.assertTrue(bot._tasks['plus']['context'].function is add)
+
+    def test_stored_arity(self):
+        function = LazyFunction('math:factorial', 1)
+        self.assertEqual(get_args_count(function), 1)
+        self.assertTrue(function._function is None)
+        self.assertEqual(function(4), 24)
+
+    def test_modifiers_and_options(self):
+        self.bot.add_modifier('double', ('plus',), 1,
+                              Botify.ACTION_UPDATE_CONTEXT,
+                              Context(multiply, 1, True))
+        self.bot.add_modifier('not', ('times',), 1, Botify.ACTION_DELETE, 0)
+        self.bot.strict_mode_enabled = False
+        self.bot.enable_plan_cache(16)
+        self.bot.enable_result_cache(32, ttl=60)
+        bot = restore_snapshot(dump_snapshot(self.bot))
+        self.assertFalse(bot.strict_mode_enabled)
+        self.assertEqual(bot.plan_cache_info().maxsize, 16)
+        self.assertEqual(bot.result_cache_info().maxsize, 32)
+        self.assertTrue(bot._modifiers['double']['plus'][0][1].pure)
+        for text in ("double plus 2 3", "2 not times 3 plus 4"):
+            self.assertEqual(bot.parse(text), self.bot.parse(text))
+
+    def test_lambda_is_rejected(self):
+        self.bot.add_task(('negate',), Context(lambda a: -a, 3), (1,))
+        self.assertRaises(ValueError, self.bot.save_snapshot, self.path)
+
+    def test_unsupported_version(self):
+        snapshot = dump_snapshot(self.bot)
+        snapshot['version'] += 1
+        self.assertRaises(ValueError, restore_snapshot, snapshot)
+        self.assertRaises(ValueError, restore_snapshot, {})
+
+
+class ParseSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.bot = make_calculator()
+        self.bot.set_trace_level(Botify.TRACE_FULL)
+
+    def test_session_result_and_report(self):
+        session = self.bot.parse_session("2 plus 3 times 4")
+        self.assertTrue(isinstance(session, ParseSession))
+        self.assertEqual(session.result, (14.0,))
+        self.assertEqual([entry['function'] for entry in session.report],
+                         ['multiply', 'add'])
+        self.assertEqual(session.report[0]['parameters'], (3.0, 4.0))
+        self.assertEqual(session.tokens, ['2', 'plus', '3', 'times', '4'])
+
+    def test_get_report_describes_last_parse(self):
+        self.bot.parse("2 plus 3")
+        self.assertEqual(self.bot._get_report(),
+                         self.bot.parse_session("2 plus 3").report)
+
+    def test_concurrent_parses(self):
+        errors = []
+
+        def worker(offset):
+            try:
+                for i in range(200):
+                    a, b = offset, i
+                    text = "{0} plus {1} times 2".format(a, b)
+                    session = self.bot.parse_session(text)
+                    if session.result != (a + b * 2.0,):
+                        errors.append((text, session.result))
+                    if len(session.report) != 2:
+                        errors.append((text, session.report))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+
 def free_method(params):
     pass
 
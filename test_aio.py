@@ -0,0 +1,64 @@
+"""Coroutines used by the asyncio tests of test.py.
+
+async def is a syntax error before Python 3.5, so this module is only
+imported by the tests which are run on Python 3.5 and later.
+"""
+import asyncio
+import json
+
+from botify.loadgen import run_load
+from botify.server import ParseServer
+
+
+def make_lookup(test):
+    # a task function recording how many of its calls run at the same time
+    async def lookup(a):
+        test.running += 1
+        test.max_running = max(test.max_running, test.running)
+        await asyncio.sleep(0.01)
+        test.running -= 1
+        return a * 10
+
+    return lookup
+
+
+async def serve(bot, client, **options):
+    server = ParseServer(bot, max_workers=2, **options)
+    await server.start()
+    try:
+        return await client(*server.address), server.stats()
+    finally:
+        await server.close()
+
+
+async def send_requests(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"id": 1, "text": "2 plus 3 times 4"}\n'
+                 b'{"id": 2, "text": "plus"}\n'
+                 b'not json\n')
+    writer.write_eof()
+    responses = [json.loads(line.decode('utf-8'))
+                 for line in (await reader.read()).splitlines()]
+    writer.close()
+    return responses
+
+
+async def send_long_line(host, port):
+    # a line longer than the limit of the stream reader, and a connection
+    # left open when the server is closed
+    idle = await asyncio.open_connection(host, port)
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b'{"id": 1, "text": "' + b'2 plus ' * 20000 + b'3"}\n'
+                 b'{"id": 2, "text": "2 plus 3"}\n')
+    writer.write_eof()
+    responses = [json.loads(line.decode('utf-8'))
+                 for line in (await reader.read()).splitlines()]
+    writer.close()
+    return responses
+
+
+def load(texts, **options):
+    async def client(host, port):
+        return await run_load(host, port, texts, **options)
+
+    return client